@@ -0,0 +1,507 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterator
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+JOB_STATES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+
+# Progress from tight loops is written (and the cancel flag re-read) at most this often.
+PROGRESS_INTERVAL_SECONDS = 0.5
+# Submitting a job fails the jobs of dead workers at most this often.
+ORPHAN_CHECK_SECONDS = 60.0
+KEEP_FINISHED_JOBS = 500
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    label: str
+    state: str
+    progress: float
+    message: str
+    created_by: str
+    created_at: float
+    started_at: float | None
+    finished_at: float | None
+    result: dict | None
+    artifact: str
+    error: str
+    cancel_requested: bool
+    dedupe_key: str
+    owner_pid: int
+    upload: str = ""
+    owner_token: str = ""
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    @property
+    def duration(self) -> float | None:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("owner_pid")
+        data.pop("dedupe_key")
+        data.pop("upload")
+        data.pop("owner_token")
+        data["artifact"] = os.path.basename(self.artifact) if self.artifact else ""
+        data["active"] = self.active
+        data["created"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at))
+        data["duration"] = round(self.duration, 3) if self.duration is not None else None
+        return data
+
+
+_COLUMNS = [
+    "id", "kind", "label", "state", "progress", "message", "created_by", "created_at", "started_at",
+    "finished_at", "result", "artifact", "error", "cancel_requested", "dedupe_key", "owner_pid", "upload",
+    "owner_token",
+]
+
+
+def discard_upload(path: str) -> None:
+    """Remove a job's upload file; it may already be gone."""
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _process_token(pid: int) -> str:
+    """Boot id and start time of process ``pid``: tells a reused PID from the process that had it.
+
+    Empty where /proc is not available (Windows); the PID alone is checked there.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+            # Fields after the parenthesized command name; the start time is field 22 of stat.
+            started = f.read().rsplit(")", 1)[1].split()[19]
+        with open("/proc/sys/kernel/random/boot_id", "r", encoding="utf-8") as f:
+            boot_id = f.read().strip()
+    except (OSError, IndexError):
+        return ""
+    return f"{boot_id}:{started}"
+
+
+_own_token: dict[int, str] = {}
+
+
+def own_process_token() -> str:
+    # Keyed by PID, so a worker forked after import computes its own.
+    pid = os.getpid()
+    if pid not in _own_token:
+        _own_token[pid] = _process_token(pid)
+    return _own_token[pid]
+
+
+def _owner_alive(pid: int, token: str) -> bool:
+    if not _pid_alive(pid):
+        return False
+    if not token:
+        return True
+    current = own_process_token() if pid == os.getpid() else _process_token(pid)
+    return not current or current == token
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Job table in SQLite, shared by every worker process (WAL mode, short-lived connections)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized_path: str | None = None
+        self._init_lock = threading.Lock()
+
+    def relocate(self, path: str) -> None:
+        self.path = path
+        self._initialized_path = None
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized_path == self.path:
+                return
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " label TEXT NOT NULL DEFAULT '',"
+                " state TEXT NOT NULL,"
+                " progress REAL NOT NULL DEFAULT 0,"
+                " message TEXT NOT NULL DEFAULT '',"
+                " created_by TEXT NOT NULL DEFAULT '',"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " result TEXT,"
+                " artifact TEXT NOT NULL DEFAULT '',"
+                " error TEXT NOT NULL DEFAULT '',"
+                " cancel_requested INTEGER NOT NULL DEFAULT 0,"
+                " dedupe_key TEXT NOT NULL DEFAULT '',"
+                " owner_pid INTEGER NOT NULL,"
+                " upload TEXT NOT NULL DEFAULT '',"
+                " owner_token TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            for column in ("upload", "owner_token"):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+            connection.commit()
+            self._initialized_path = self.path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            self._ensure_schema(connection)
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _job(row) -> Job:
+        values = dict(zip(_COLUMNS, row))
+        values["result"] = json.loads(values["result"]) if values["result"] else None
+        values["cancel_requested"] = bool(values["cancel_requested"])
+        return Job(**values)
+
+    def create(self, kind: str, label: str = "", created_by: str = "", dedupe_key: str = "", upload: str = "") -> tuple[Job, bool]:
+        """Insert a queued job; returns ``(job, created)``.
+
+        With a ``dedupe_key``, an already queued job with the same key is returned
+        instead, since it has not read its inputs yet and will see the latest data. Only
+        this process's jobs count: another worker's queue may have died with it.
+        ``upload`` is a file saved for the job to read; it is removed however the job ends.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if dedupe_key:
+                row = connection.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+                    " WHERE dedupe_key = ? AND state = ? AND cancel_requested = 0 AND owner_pid = ? AND owner_token = ?",
+                    (dedupe_key, QUEUED, os.getpid(), own_process_token()),
+                ).fetchone()
+                if row is not None:
+                    return self._job(row), False
+            job = Job(
+                id=uuid.uuid4().hex[:16],
+                kind=kind,
+                label=label,
+                state=QUEUED,
+                progress=0.0,
+                message="Queued",
+                created_by=created_by,
+                created_at=time.time(),
+                started_at=None,
+                finished_at=None,
+                result=None,
+                artifact="",
+                error="",
+                cancel_requested=False,
+                dedupe_key=dedupe_key,
+                owner_pid=os.getpid(),
+                upload=upload,
+                owner_token=own_process_token(),
+            )
+            values = asdict(job)
+            values["result"] = None
+            values["cancel_requested"] = 0
+            connection.execute(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                [values[name] for name in _COLUMNS],
+            )
+            return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        with self._connect() as connection:
+            row = connection.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, limit: int = 100, kind: str = "", state: str = "") -> list[Job]:
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs {where} ORDER BY created_at DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def kinds(self) -> list[str]:
+        with self._connect() as connection:
+            return [row[0] for row in connection.execute("SELECT DISTINCT kind FROM jobs ORDER BY kind")]
+
+    def update(self, job_id: str, **fields) -> None:
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str) if fields["result"] is not None else None
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as connection:
+            connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
+
+    def start(self, job_id: str) -> bool:
+        """Move a queued job to running; False if it was cancelled while it waited."""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = ?, started_at = ?, message = ? WHERE id = ? AND state = ? AND cancel_requested = 0",
+                (RUNNING, time.time(), "Started", job_id, QUEUED),
+            )
+            if cursor.rowcount:
+                return True
+            connection.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, message = ? WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), "Cancelled before it started", job_id, QUEUED),
+            )
+            row = connection.execute("SELECT upload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        # The job never runs, so its upload would otherwise stay behind.
+        discard_upload(row[0] if row else "")
+        return False
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as connection:
+            row = connection.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def request_cancel(self, job_id: str) -> Job | None:
+        """Flag a job for cancellation; a queued job is cancelled at once."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state IN (?, ?)",
+                (job_id, QUEUED, RUNNING),
+            )
+            connection.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, message = ? WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), "Cancelled before it started", job_id, QUEUED),
+            )
+        return self.get(job_id)
+
+    def fail_orphans(self) -> int:
+        """Fail active jobs whose worker process is gone, even if its PID was reused; their queue died with it."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, owner_pid, owner_token, upload FROM jobs WHERE state IN (?, ?)",
+                ACTIVE_STATES,
+            ).fetchall()
+            orphans = [(job_id, upload) for job_id, pid, token, upload in rows if not _owner_alive(pid, token)]
+            for job_id, _ in orphans:
+                connection.execute(
+                    "UPDATE jobs SET state = ?, finished_at = ?, error = ?, message = ? WHERE id = ?",
+                    (FAILED, time.time(), "The worker process running this job exited.", "Interrupted", job_id),
+                )
+        for _, upload in orphans:
+            discard_upload(upload)
+        return len(orphans)
+
+    def prune(self, keep: int = KEEP_FINISHED_JOBS) -> list[Job]:
+        """Drop finished jobs beyond the newest ``keep`` and return them.
+
+        Their artifacts are shared exports (linked_data.xlsx, all_data.xlsx) that later
+        jobs rebuild in place, so they are left alone; uploads are gone by now.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE state NOT IN (?, ?) ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                (QUEUED, RUNNING, keep),
+            ).fetchall()
+            jobs = [self._job(row) for row in rows]
+            connection.executemany("DELETE FROM jobs WHERE id = ?", [(job.id,) for job in jobs])
+        return jobs
+
+
+class JobContext:
+    """Handed to a job function: report progress, honour cancellation, attach a result file."""
+
+    def __init__(self, store: JobStore, job: Job):
+        self.store = store
+        self.job = job
+        self.artifact = ""
+        self._last_write = 0.0
+        self._cancelled = False
+
+    def progress(self, fraction: float, message: str | None = None, force: bool = False) -> None:
+        """Record progress (0..1); also picks up a cancel request for check_cancelled()."""
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        fields = {"progress": max(0.0, min(1.0, float(fraction)))}
+        if message is not None:
+            fields["message"] = message
+        self.store.update(self.job.id, **fields)
+        self._cancelled = self._cancelled or self.store.cancel_requested(self.job.id)
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if an admin cancelled the job. Call it only where stopping is safe."""
+        if not self._cancelled:
+            self._cancelled = self.store.cancel_requested(self.job.id)
+        if self._cancelled:
+            raise JobCancelled()
+
+    def step(self, done: int, total: int, message: str | None = None) -> None:
+        """Progress through a loop that has not written anything yet, so it may stop here."""
+        self.progress(done / total if total else 1.0, message)
+        if self._cancelled:
+            raise JobCancelled()
+
+    def set_artifact(self, path: str) -> None:
+        self.artifact = path
+
+
+class JobRunner:
+    """Runs jobs on a worker thread pool and records their lifecycle in a JobStore.
+
+    Job functions take a JobContext first and return a JSON-serializable dict (or
+    None). Exceptions fail the job with their message; JobCancelled cancels it.
+    A job submitted with ``upload`` may remove that file early; the runner removes it
+    after the job ends, when it is cancelled before starting, or when its worker died.
+    ``max_workers=0`` runs every job inline in ``submit``, for scripts and tests.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 2, on_finish: Callable[[Job], None] | None = None):
+        self.store = store
+        self.max_workers = max_workers
+        self.on_finish = on_finish
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: set[Future] = set()
+        self._lock = threading.Lock()
+        self._recovered_path: str | None = None
+        self._recovered_at = 0.0
+
+    def relocate(self, path: str) -> None:
+        self.store.relocate(path)
+        self._recovered_path = None
+
+    def _recover(self) -> None:
+        # Not just once per process: another worker can die while this one keeps running.
+        if self._recovered_path == self.store.path and time.monotonic() - self._recovered_at < ORPHAN_CHECK_SECONDS:
+            return
+        self._recovered_path = self.store.path
+        self._recovered_at = time.monotonic()
+        failed = self.store.fail_orphans()
+        if failed:
+            logger.warning("Marked %s interrupted job(s) as failed", failed)
+
+    def submit(
+        self, kind: str, func: Callable, *args, label: str = "", created_by: str = "", dedupe_key: str = "", upload: str = "", **kwargs
+    ) -> Job:
+        self._recover()
+        job, created = self.store.create(kind, label=label, created_by=created_by, dedupe_key=dedupe_key, upload=upload)
+        if not created:
+            discard_upload(upload)
+            return job
+        if self.max_workers <= 0:
+            self._run(job, func, args, kwargs)
+            return self.store.get(job.id) or job
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="nin-job")
+            future = self._executor.submit(self._run, job, func, args, kwargs)
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return job
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def _run(self, job: Job, func: Callable, args, kwargs) -> None:
+        if not self.store.start(job.id):
+            return
+        context = JobContext(self.store, job)
+        try:
+            result = func(context, *args, **kwargs)
+        except JobCancelled:
+            self.store.update(job.id, state=CANCELLED, finished_at=time.time(), message="Cancelled")
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            self.store.update(job.id, state=FAILED, finished_at=time.time(), error=str(e) or type(e).__name__, message="Failed")
+        else:
+            message = (result or {}).get("message") or "Done"
+            self.store.update(
+                job.id,
+                state=SUCCEEDED,
+                progress=1.0,
+                finished_at=time.time(),
+                result=result,
+                artifact=context.artifact,
+                message=message,
+            )
+        discard_upload(job.upload)
+        if self.on_finish is not None:
+            finished = self.store.get(job.id)
+            if finished is not None:
+                try:
+                    self.on_finish(finished)
+                except Exception:
+                    logger.exception("Job finish hook failed for %s", job.id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        return self.store.request_cancel(job_id)
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until every job submitted by this process has finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                pending = list(self._futures)
+            if not pending:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            wait(pending, timeout=remaining)
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, Mapping
+
+from sparse_records import RecordView, SparseRecord
+
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+OPS = (INSERT, UPDATE, DELETE)
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateKey(ValueError):
+    """Rows written to one feed table share a key, so the diff would drop all but one of them."""
+
+
+@dataclass(frozen=True)
+class FeedTable:
+    """One logical table in the feed, read from the CSV files named ``file_name``.
+
+    ``fields`` limits the table to those columns and ``exclude`` drops columns, so one
+    file can feed several tables (linked rows and their machine results). A row belongs
+    to the table while it has a key and at least one other non-empty column.
+    """
+
+    name: str
+    file_name: str
+    key_field: str
+    fields: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+
+    def key(self, row: Mapping) -> str:
+        return str(row.get(self.key_field, "") or "").strip()
+
+    def project(self, row: Mapping) -> dict[str, str]:
+        if isinstance(row, (SparseRecord, RecordView)):
+            values = row.nonempty()
+        else:
+            values = {str(k): str(v) for k, v in row.items() if k is not None and v not in ("", None)}
+        if self.fields:
+            values = {k: v for k, v in values.items() if k in self.fields or k == self.key_field}
+        elif self.exclude:
+            values = {k: v for k, v in values.items() if k not in self.exclude}
+        if not any(k != self.key_field for k in values):
+            return {}
+        return values
+
+
+@dataclass
+class Change:
+    seq: int
+    recorded_at: float
+    table: str
+    op: str
+    key: str
+    data: dict
+    changed: list
+    actor: str
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["recorded"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.recorded_at))
+        return data
+
+
+class ChangeSet:
+    """Old and new rows of the files rewritten by one logical write.
+
+    Rows are collected per file and diffed per table when the write is recorded, so a
+    row that moves between files of the same table (a site shard change) reads as one
+    update instead of a delete and an insert.
+    """
+
+    def __init__(self):
+        self.old: dict[str, dict[str, Mapping]] = {}
+        self.new: dict[str, dict[str, Mapping]] = {}
+        self.tables: dict[str, FeedTable] = {}
+
+    def add(self, tables: Iterable[FeedTable], old_rows: Iterable[Mapping], new_rows: Iterable[Mapping]) -> None:
+        """Collect one file's rows before and after a write; raises DuplicateKey for the rows written.
+
+        Rows already on disk may predate unique keys; there the last one wins, as it did
+        for consumers of the feed.
+        """
+        old_rows, new_rows = list(old_rows), list(new_rows)
+        for table in tables:
+            new = {}
+            for row in new_rows:
+                key = table.key(row)
+                if key in new:
+                    raise DuplicateKey(f"{table.file_name}: {table.key_field} {key!r} is on more than one row")
+                if key:
+                    new[key] = row
+            old = self.old.setdefault(table.name, {})
+            for row in old_rows:
+                key = table.key(row)
+                if key:
+                    old[key] = row
+            self.tables[table.name] = table
+            self.new.setdefault(table.name, {}).update(new)
+
+    def merge(self, other: "ChangeSet") -> None:
+        """Take in the rows collected by ``other``, as if they had been added here."""
+        for name, table in other.tables.items():
+            self.tables[name] = table
+            self.old.setdefault(name, {}).update(other.old.get(name, {}))
+            self.new.setdefault(name, {}).update(other.new.get(name, {}))
+
+    def changes(self) -> list[tuple[str, str, str, dict, list]]:
+        """``(table, op, key, data, changed)`` for every row that differs; ``data`` holds non-empty columns."""
+        changes = []
+        for name, table in self.tables.items():
+            old, new = self.old.get(name, {}), self.new.get(name, {})
+            for key in list(old) + [key for key in new if key not in old]:
+                before, after = old.get(key), new.get(key)
+                # Same-schema records compare as tuples, so unchanged rows cost almost nothing.
+                if before is not None and after is not None and before == after:
+                    continue
+                before = table.project(before) if before is not None else {}
+                after = table.project(after) if after is not None else {}
+                if before == after:
+                    continue
+                if not before:
+                    changes.append((name, INSERT, key, after, sorted(after)))
+                elif not after:
+                    changes.append((name, DELETE, key, before, []))
+                else:
+                    changed = sorted(k for k in before.keys() | after.keys() if before.get(k, "") != after.get(k, ""))
+                    changes.append((name, UPDATE, key, after, changed))
+        return changes
+
+
+_COLUMNS = ["seq", "recorded_at", "table_name", "op", "key", "data", "changed", "actor"]
+
+
+class ChangeFeed:
+    """Append-only change log in SQLite with a monotonic sequence number.
+
+    Every worker process appends to the same database (WAL mode, short-lived
+    connections); SQLite serializes the inserts, so sequence order is commit order
+    and a reader paging with ``since`` never skips a change.
+    """
+
+    def __init__(self, path: str, tables: Iterable[FeedTable] = (), enabled: bool = True):
+        self.path = path
+        self.tables = list(tables)
+        self.enabled = enabled
+        self._initialized_path: str | None = None
+        self._init_lock = threading.Lock()
+
+    def relocate(self, path: str) -> None:
+        self.path = path
+        self._initialized_path = None
+
+    def tables_for(self, file_name: str) -> list[FeedTable]:
+        return [table for table in self.tables if table.file_name == file_name]
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized_path == self.path:
+                return
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " recorded_at REAL NOT NULL,"
+                " table_name TEXT NOT NULL,"
+                " op TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " changed TEXT NOT NULL,"
+                " actor TEXT NOT NULL DEFAULT '')"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS changes_table_seq ON changes (table_name, seq)")
+            connection.commit()
+            self._initialized_path = self.path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            self._ensure_schema(connection)
+            # The CSV write this records is already on disk; losing the last changes on a
+            # power cut is the same window the data files have.
+            connection.execute("PRAGMA synchronous=NORMAL")
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _change(row) -> Change:
+        values = dict(zip(_COLUMNS, row))
+        return Change(
+            seq=values["seq"],
+            recorded_at=values["recorded_at"],
+            table=values["table_name"],
+            op=values["op"],
+            key=values["key"],
+            data=json.loads(values["data"]),
+            changed=json.loads(values["changed"]),
+            actor=values["actor"],
+        )
+
+    def append(self, changes: Iterable[tuple[str, str, str, dict, list]], actor: str = "") -> int:
+        """Record ``(table, op, key, data, changed)`` tuples in order; returns the last sequence number."""
+        now = time.time()
+        rows = [
+            (now, table, op, key, json.dumps(data, ensure_ascii=False, separators=(",", ":")), json.dumps(changed), actor)
+            for table, op, key, data, changed in changes
+        ]
+        if not rows:
+            return 0
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO changes (recorded_at, table_name, op, key, data, changed, actor) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return connection.execute("SELECT MAX(seq) FROM changes").fetchone()[0]
+
+    def read(self, since: int = 0, limit: int = DEFAULT_PAGE_SIZE, tables: Iterable[str] = ()) -> list[Change]:
+        """Changes with ``seq > since`` in sequence order, at most ``limit`` of them."""
+        tables = [table for table in tables if table]
+        clauses, params = ["seq > ?"], [int(since)]
+        if tables:
+            clauses.append(f"table_name IN ({', '.join('?' for _ in tables)})")
+            params.extend(tables)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM changes WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?",
+                params + [max(1, min(int(limit), MAX_PAGE_SIZE))],
+            ).fetchall()
+        return [self._change(row) for row in rows]
+
+    def bounds(self) -> tuple[int, int]:
+        """``(oldest, latest)`` sequence numbers still stored; ``(0, 0)`` when empty."""
+        with self._connect() as connection:
+            oldest, latest = connection.execute("SELECT MIN(seq), MAX(seq) FROM changes").fetchone()
+        return oldest or 0, latest or 0
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT table_name, op, COUNT(*) FROM changes GROUP BY table_name, op").fetchall()
+        counts: dict[str, dict[str, int]] = {}
+        for table, op, count in rows:
+            counts.setdefault(table, {})[op] = count
+        return counts
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Drop changes recorded before the cutoff; readers behind it must resync from the CSVs."""
+        cutoff = time.time() - older_than_seconds
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM changes WHERE recorded_at < ?", (cutoff,)).rowcount
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Tail, inspect or prune the change feed of profiles, responses and linked data.")
+    parser.add_argument("command", choices=["tail", "status", "prune"])
+    parser.add_argument("--data-dir", help="Read the feed under this data directory instead of the app's DATA_DIR.")
+    parser.add_argument("--url", help="Tail a running server instead, e.g. https://host/admin/changes.")
+    parser.add_argument("--token", default=os.getenv("CHANGE_FEED_TOKEN", ""), help="Bearer token for --url (default: $CHANGE_FEED_TOKEN).")
+    parser.add_argument("--since", type=int, help="Start after this sequence number (default: the --state file, else 0).")
+    parser.add_argument("--state", help="File holding the last sequence printed; read on start, updated after each page.")
+    parser.add_argument("--table", action="append", default=[], help="Only this table (repeatable).")
+    parser.add_argument("--limit", type=int, default=DEFAULT_PAGE_SIZE, help="Page size.")
+    parser.add_argument("--follow", "-f", action="store_true", help="Keep polling for new changes.")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls with --follow.")
+    parser.add_argument("--days", type=float, default=90, help="prune: keep this many days of changes.")
+    return parser
+
+
+def _read_state(path: str | None) -> int:
+    if not path:
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_state(path: str | None, seq: int) -> None:
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(f"{seq}\n")
+    os.replace(temp_path, path)
+
+
+def _fetch_page(url: str, token: str, since: int, limit: int, tables: list[str]) -> dict:
+    query = urllib.parse.urlencode([("since", since), ("limit", limit)] + [("table", table) for table in tables])
+    request = urllib.request.Request(f"{url}{'&' if '?' in url else '?'}{query}")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    feed = None
+    if not args.url:
+        import app as nin_app
+
+        if args.data_dir:
+            nin_app.configure_data_paths(args.data_dir)
+        feed = nin_app.CHANGE_FEED
+
+    if args.command == "status":
+        if feed is None:
+            page = _fetch_page(args.url, args.token, 0, 1, [])
+            print(f"oldest {page['oldest']}  latest {page['latest']}")
+            return 0
+        oldest, latest = feed.bounds()
+        print(f"{feed.path}: oldest {oldest}  latest {latest}")
+        for table, ops in sorted(feed.counts().items()):
+            print(f"  {table:<10}" + "".join(f"  {op} {ops.get(op, 0):>8}" for op in OPS))
+        return 0
+    if args.command == "prune":
+        if feed is None:
+            print("prune works on the local feed only (drop --url)", file=sys.stderr)
+            return 2
+        print(f"{feed.prune(args.days * 86400)} changes older than {args.days:g} days removed")
+        return 0
+
+    since = args.since if args.since is not None else _read_state(args.state)
+    while True:
+        if feed is None:
+            page = _fetch_page(args.url, args.token, since, args.limit, args.table)
+            changes, oldest, has_more = page["changes"], page["oldest"], page["has_more"]
+        else:
+            changes = [change.to_dict() for change in feed.read(since, args.limit, args.table)]
+            oldest, latest = feed.bounds()
+            # As the HTTP endpoint does: read() caps the page, so its length says nothing.
+            has_more = bool(changes) and changes[-1]["seq"] < latest
+        if oldest and since < oldest - 1:
+            logger.warning("changes %s-%s were pruned; resync from the CSV files before applying these", since + 1, oldest - 1)
+        for change in changes:
+            print(json.dumps(change, ensure_ascii=False, separators=(",", ":")))
+        if changes:
+            since = changes[-1]["seq"]
+            sys.stdout.flush()
+            _write_state(args.state, since)
+        if has_more:
+            continue
+        if not args.follow:
+            return 0
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
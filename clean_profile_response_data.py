@@ -3,9 +3,10 @@ from __future__ import annotations
 import csv
 import re
 from dataclasses import dataclass
-from datetime import date, datetime
 from pathlib import Path
 
+from derived_fields import format_age_full
+
 
 DOWNLOADS_DIR = Path(r"C:\Users\OMEN\Downloads")
 PROFILES_PATH = DOWNLOADS_DIR / "profiles.csv"
@@ -49,48 +50,6 @@ def write_csv(path: Path, fieldnames: list[str], rows: list[dict[str, str]]) ->
         writer.writerows(rows)
 
 
-def parse_date(value: str) -> date | None:
-    text = (value or "").strip()
-    if not text:
-        return None
-    for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S"):
-        try:
-            parsed = datetime.strptime(text, fmt)
-            return parsed.date()
-        except ValueError:
-            continue
-    return None
-
-
-def format_age_full(dob_value: str, ref_value: str) -> str:
-    dob = parse_date(dob_value)
-    ref = parse_date(ref_value)
-    if not dob or not ref or ref < dob:
-        return ""
-
-    years = ref.year - dob.year
-    months = ref.month - dob.month
-    days = ref.day - dob.day
-
-    if days < 0:
-        months -= 1
-        previous_month = ref.month - 1 or 12
-        previous_year = ref.year if ref.month > 1 else ref.year - 1
-        if previous_month == 12:
-            next_month = date(previous_year + 1, 1, 1)
-        else:
-            next_month = date(previous_year, previous_month + 1, 1)
-        current_month = date(previous_year, previous_month, 1)
-        days_in_previous_month = (next_month - current_month).days
-        days += days_in_previous_month
-
-    if months < 0:
-        years -= 1
-        months += 12
-
-    return f"{years} years {months} months {days} days"
-
-
 def split_name(full_name: str, existing_name: str) -> tuple[str, str]:
     full = " ".join((full_name or "").split())
     current_name = " ".join((existing_name or "").split())
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # optional; the CSV and XLSX exports do not need it
+    pa = None
+    ds = None
+
+
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+PARTITION_COLUMNS = ["school_key", "month"]
+UNKNOWN_PARTITION = "unknown"
+
+# Columns that are not form inputs but still have a natural type.
+TIMESTAMP_FIELDS = {"created_at", "submitted_at", "saved_at", "study_datetime", "age_calculated_at"}
+DATE_FIELDS = {"dob"}
+INTEGER_FIELDS = {"age"}
+CATEGORY_FIELDS = {"gender", "school", "location", "class", "section", "profile_found", "school_anganwadi_name"}
+
+
+class ColumnarUnavailable(RuntimeError):
+    pass
+
+
+def pyarrow_available() -> bool:
+    return pa is not None
+
+
+def require_pyarrow() -> None:
+    if not pyarrow_available():
+        raise ColumnarUnavailable("pyarrow is not installed; install it to enable Parquet/Arrow exports.")
+
+
+@dataclass(frozen=True)
+class ColumnarDataset:
+    name: str
+    school_field: str
+    month_field: str
+
+
+COLUMNAR_DATASETS = {
+    "profiles": ColumnarDataset("profiles", school_field="school", month_field="created_at"),
+    "responses": ColumnarDataset("responses", school_field="school_anganwadi_name", month_field="submitted_at"),
+    "linked": ColumnarDataset("linked", school_field="school", month_field="submitted_at"),
+}
+
+
+@dataclass
+class ColumnarResult:
+    dataset: str
+    format: str
+    rows: int
+    partitions: int
+    column_kinds: dict[str, str]
+    # Values that could not be parsed as their column's type and were written as null.
+    coerced_nulls: dict[str, int] = field(default_factory=dict)
+
+
+def form_field_kinds(template_path: str, expansions: dict[str, list[str]] | None = None) -> dict[str, str]:
+    """Map questionnaire fields to number/date/time/category from their input types."""
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+    expansions = expansions or {}
+    kinds: dict[str, str] = {}
+
+    def add(name: str, kind: str) -> None:
+        for expanded in expansions.get(name, [name]):
+            kinds.setdefault(expanded, kind)
+
+    input_kinds = {"number": "number", "date": "date", "time": "time", "radio": "category", "checkbox": "category"}
+    for attrs in re.findall(r"<input\b([^>]*)>", template, flags=re.IGNORECASE):
+        input_type = re.search(r'\btype="([^"]+)"', attrs, flags=re.IGNORECASE)
+        name = re.search(r'\bname="([^"]+)"', attrs)
+        if input_type and name and input_type.group(1).lower() in input_kinds:
+            add(name.group(1), input_kinds[input_type.group(1).lower()])
+    for name in re.findall(r'<select\b[^>]*\bname="([^"]+)"', template, flags=re.IGNORECASE):
+        add(name, "category")
+    return kinds
+
+
+def column_kinds(fields: list[str], form_kinds: dict[str, str], numeric_fields: list[str]) -> dict[str, str]:
+    numeric = set(numeric_fields)
+    kinds = {}
+    for name in fields:
+        form_kind = form_kinds.get(name)
+        if name in TIMESTAMP_FIELDS:
+            kinds[name] = "timestamp"
+        elif name in INTEGER_FIELDS:
+            kinds[name] = "integer"
+        elif name in numeric or form_kind == "number":
+            kinds[name] = "float"
+        elif name in DATE_FIELDS or form_kind == "date":
+            kinds[name] = "date"
+        elif form_kind == "time":
+            kinds[name] = "time"
+        elif name in CATEGORY_FIELDS or form_kind == "category":
+            kinds[name] = "category"
+        else:
+            kinds[name] = "string"
+    return kinds
+
+
+def _parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    # Stored timestamps are site wall-clock time; offsets, where present, are dropped to match.
+    return parsed.replace(tzinfo=None)
+
+
+def _parse_time(value: str) -> time:
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+_PARSERS = {
+    "timestamp": _parse_timestamp,
+    "date": lambda value: date.fromisoformat(value[:10]),
+    "time": _parse_time,
+    "float": float,
+    "integer": lambda value: int(float(value)),
+}
+
+
+def _arrow_type(kind: str):
+    return {
+        "timestamp": pa.timestamp("s"),
+        "date": pa.date32(),
+        "time": pa.time32("s"),
+        "float": pa.float64(),
+        "integer": pa.int64(),
+    }.get(kind, pa.string())
+
+
+def school_key(value) -> str:
+    key = re.sub(r"[^A-Z0-9]+", "_", str(value or "").upper()).strip("_")
+    return key or UNKNOWN_PARTITION
+
+
+def month_key(value) -> str:
+    text = str(value or "").strip()
+    return text[:7] if re.match(r"^\d{4}-\d{2}", text) else UNKNOWN_PARTITION
+
+
+def build_table(rows: list[dict], fields: list[str], kinds: dict[str, str], dataset: ColumnarDataset):
+    """Typed Arrow table plus the count of values coerced to null per column."""
+    require_pyarrow()
+    arrays = []
+    coerced: dict[str, int] = {}
+    for name in fields:
+        kind = kinds[name]
+        parser = _PARSERS.get(kind)
+        values = []
+        for row in rows:
+            text = str(row.get(name, "") or "").strip()
+            if not text:
+                values.append(None)
+            elif parser is None:
+                values.append(text)
+            else:
+                try:
+                    values.append(parser(text))
+                except (ValueError, OverflowError):
+                    values.append(None)
+                    coerced[name] = coerced.get(name, 0) + 1
+        array = pa.array(values, type=_arrow_type(kind))
+        arrays.append(array.dictionary_encode() if kind == "category" else array)
+
+    arrays.append(pa.array([school_key(row.get(dataset.school_field)) for row in rows], type=pa.string()))
+    arrays.append(pa.array([month_key(row.get(dataset.month_field)) for row in rows], type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=list(fields) + PARTITION_COLUMNS), coerced
+
+
+def write_partitioned(table, out_dir: str, fmt: str) -> int:
+    """Write ``table`` as hive-style ``school_key=.../month=...`` partitions; returns the partition count."""
+    require_pyarrow()
+    if fmt == "parquet":
+        file_format = ds.ParquetFileFormat()
+        options = file_format.make_write_options(compression="zstd")
+    else:
+        file_format = ds.IpcFileFormat()
+        options = file_format.make_write_options(compression="lz4")
+    partitioning = ds.partitioning(
+        pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+        flavor="hive",
+    )
+    ds.write_dataset(
+        table,
+        out_dir,
+        format=file_format,
+        file_options=options,
+        partitioning=partitioning,
+        basename_template="part-{i}." + FORMATS[fmt],
+        existing_data_behavior="delete_matching",
+    )
+    return len(set(zip(*(table.column(name).to_pylist() for name in PARTITION_COLUMNS))))
+
+
+def export_dataset(
+    rows: list[dict],
+    fields: list[str],
+    kinds: dict[str, str],
+    dataset: ColumnarDataset,
+    out_dir: str,
+    fmt: str,
+) -> ColumnarResult:
+    table, coerced = build_table(rows, fields, kinds, dataset)
+    partitions = write_partitioned(table, out_dir, fmt)
+    return ColumnarResult(
+        dataset=dataset.name,
+        format=fmt,
+        rows=table.num_rows,
+        partitions=partitions,
+        column_kinds=kinds,
+        coerced_nulls=coerced,
+    )
+
+
+def zip_directory(directory: str, zip_path: str) -> None:
+    # Parquet and IPC files are already compressed; store them as-is.
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for root, _dirs, files in os.walk(directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                archive.write(path, os.path.relpath(path, directory))
+
+
+def export_dataset_zip(rows, fields, kinds, dataset: ColumnarDataset, zip_path: str, fmt: str) -> ColumnarResult:
+    with tempfile.TemporaryDirectory(prefix="nin_columnar_") as work_dir:
+        result = export_dataset(rows, fields, kinds, dataset, os.path.join(work_dir, dataset.name), fmt)
+        zip_directory(os.path.join(work_dir, dataset.name), zip_path)
+    return result
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Export profiles, responses and the linked view as partitioned Parquet/Arrow.")
+    parser.add_argument("--datasets", nargs="+", choices=sorted(COLUMNAR_DATASETS), default=sorted(COLUMNAR_DATASETS))
+    parser.add_argument("--formats", nargs="+", choices=sorted(FORMATS), default=["parquet"])
+    parser.add_argument("--out", default="columnar_export", help="Output directory; one <dataset>/<format>/ tree per export.")
+    parser.add_argument("--data-dir", help="Read data from here instead of the app's DATA_DIR.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    try:
+        require_pyarrow()
+    except ColumnarUnavailable as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    import app as nin_app
+
+    if args.data_dir:
+        nin_app.configure_data_paths(args.data_dir)
+    for name in args.datasets:
+        rows, fields, kinds = nin_app.columnar_source(name)
+        for fmt in args.formats:
+            out_dir = os.path.join(args.out, name, fmt)
+            result = export_dataset(rows, fields, kinds, COLUMNAR_DATASETS[name], out_dir, fmt)
+            coerced = sum(result.coerced_nulls.values())
+            print(f"{name:<10} {fmt:<8} {result.rows:>8} rows  {result.partitions:>5} partitions  {coerced} coerced to null -> {out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import argparse
+import mimetypes
+import os
+import sys
+import tempfile
+import zlib
+from typing import Iterable, Iterator
+
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/csv",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+DEFAULT_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+# Brotli quality 5 compresses better than gzip -6 at similar speed; 11 is for precompression only.
+BROTLI_STREAM_QUALITY = 5
+BROTLI_STATIC_QUALITY = 11
+
+
+def supported_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encodings) -> str | None:
+    """Pick the best encoding the client accepts (werkzeug ``request.accept_encodings``)."""
+    for encoding in supported_encodings():
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def is_compressible(mimetype: str | None) -> bool:
+    return bool(mimetype) and (mimetype in COMPRESSIBLE_MIMETYPES or mimetype.endswith("+json"))
+
+
+class _Compressor:
+    def __init__(self, encoding: str, quality: int | None = None):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=quality or BROTLI_STREAM_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits=31 writes a gzip header/trailer rather than a bare zlib stream.
+            self._zlib = zlib.compressobj(quality or GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(chunk)
+        return self._zlib.compress(chunk)
+
+    def flush(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress_bytes(data: bytes, encoding: str, quality: int | None = None) -> bytes:
+    compressor = _Compressor(encoding, quality)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compressed(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress an iterable of byte chunks lazily, so the body is never held in memory."""
+    compressor = _Compressor(encoding)
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _weaken_etag(response) -> None:
+    # The encoded body is a different byte sequence, so its validator can only be weak.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def _mark_encoded(response, encoding: str) -> None:
+    response.headers["Content-Encoding"] = encoding
+    response.headers.pop("Accept-Ranges", None)
+    response.vary.add("Accept-Encoding")
+    _weaken_etag(response)
+
+
+def compress_response(response, encoding: str | None, min_bytes: int = DEFAULT_MIN_BYTES):
+    """Encode a Flask response for the client, streaming bodies that are streamed or file-backed."""
+    if not is_compressible(response.mimetype):
+        return response
+    # Even when this response is not encoded, a client with a different Accept-Encoding may get a different body.
+    response.vary.add("Accept-Encoding")
+    if (
+        encoding is None
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or "no-transform" in (response.headers.get("Cache-Control") or "")
+    ):
+        return response
+
+    length = response.content_length
+    if length is not None and length < min_bytes:
+        return response
+
+    if response.is_streamed or response.direct_passthrough:
+        body = response.response
+        response.direct_passthrough = False
+        response.response = iter_compressed(
+            (chunk.encode("utf-8") if isinstance(chunk, str) else chunk for chunk in body),
+            encoding,
+        )
+        response.headers.pop("Content-Length", None)
+        _mark_encoded(response, encoding)
+        return response
+
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+    response.set_data(compress_bytes(data, encoding))
+    _mark_encoded(response, encoding)
+    return response
+
+
+def precompressed_path(cache_dir: str, digest: str, encoding: str) -> str:
+    return os.path.join(cache_dir, digest + PRECOMPRESSED_SUFFIXES[encoding])
+
+
+def ensure_precompressed(source_path: str, digest: str, cache_dir: str, encoding: str) -> str | None:
+    """Return a cached, maximally compressed copy of ``source_path``, keyed by its content digest."""
+    target = precompressed_path(cache_dir, digest, encoding)
+    if os.path.exists(target):
+        return target
+    try:
+        with open(source_path, "rb") as f:
+            data = f.read()
+        quality = BROTLI_STATIC_QUALITY if encoding == "br" else 9
+        compressed = compress_bytes(data, encoding, quality)
+        if len(compressed) >= len(data):
+            return None
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix="tmp_pre_", dir=cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    except OSError:
+        return None
+    return target
+
+
+def use_precompressed(response, environ, path: str, encoding: str):
+    """Swap a static file response's body for its precompressed variant."""
+    close = getattr(response.response, "close", None)
+    if close is not None:
+        close()
+    response.response = wrap_file(environ, open(path, "rb"))
+    response.direct_passthrough = True
+    response.content_length = os.path.getsize(path)
+    _mark_encoded(response, encoding)
+    return response
+
+
+def precompress_tree(static_dir: str, cache_dir: str, digest_for) -> int:
+    """Warm the precompressed cache for every compressible file under ``static_dir``."""
+    written = 0
+    for root, _dirs, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if not is_compressible(mimetypes.guess_type(name)[0]):
+                continue
+            digest = digest_for(path)
+            if not digest:
+                continue
+            for encoding in supported_encodings():
+                if ensure_precompressed(path, digest, cache_dir, encoding):
+                    written += 1
+    return written
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Precompress static assets (gzip, and brotli when installed).")
+    parser.add_argument("--static", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+    parser.add_argument("--cache-dir", help="Defaults to the app's STATIC_PRECOMPRESSED_DIR.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    import app as nin_app
+
+    cache_dir = args.cache_dir or nin_app.STATIC_PRECOMPRESSED_DIR
+    written = precompress_tree(args.static, cache_dir, nin_app.FILE_DIGESTS.digest)
+    print(f"{written} precompressed file(s) in {cache_dir} ({', '.join(supported_encodings())})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
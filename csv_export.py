@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import csv
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+
+COMPLETION_STATES = ("complete", "in_progress")
+CHUNK_BYTES = 64 * 1024
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ExportError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    name: str
+    path: Callable[[], str]
+    fields: list[str]
+    date_field: str
+    school_field: str
+    investigator_fields: tuple[str, ...] = ()
+    has_completion: bool = False
+
+
+@dataclass
+class ExportFilters:
+    school: str = ""
+    date_from: str = ""
+    date_to: str = ""
+    investigator: str = ""
+    completion: str = ""
+    columns: list[str] = field(default_factory=list)
+
+
+def _folded(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def parse_export_filters(args, dataset: ExportDataset) -> ExportFilters:
+    """Validate query arguments (a werkzeug MultiDict) against ``dataset``."""
+    filters = ExportFilters(
+        school=(args.get("school") or "").strip(),
+        date_from=(args.get("from") or "").strip(),
+        date_to=(args.get("to") or "").strip(),
+        investigator=(args.get("investigator") or "").strip(),
+        completion=(args.get("completion") or "").strip().lower(),
+    )
+    for label, value in (("from", filters.date_from), ("to", filters.date_to)):
+        if value and not _DATE_RE.match(value):
+            raise ExportError(f"'{label}' must be a date in YYYY-MM-DD format.")
+    if filters.completion and filters.completion not in COMPLETION_STATES:
+        raise ExportError(f"'completion' must be one of: {', '.join(COMPLETION_STATES)}.")
+    if filters.completion and not dataset.has_completion:
+        raise ExportError(f"The {dataset.name} export cannot be filtered by completion.")
+    if filters.investigator and not dataset.investigator_fields:
+        raise ExportError(f"The {dataset.name} export cannot be filtered by investigator.")
+
+    columns = []
+    for value in args.getlist("columns"):
+        columns.extend(part.strip() for part in value.split(",") if part.strip())
+    unknown = [column for column in columns if column not in dataset.fields]
+    if unknown:
+        raise ExportError(f"Unknown column(s): {', '.join(unknown)}")
+    filters.columns = list(dict.fromkeys(columns)) or list(dataset.fields)
+    return filters
+
+
+def row_matches(
+    row: dict,
+    dataset: ExportDataset,
+    filters: ExportFilters,
+    completion_state: Callable[[dict], str] | None = None,
+) -> bool:
+    if filters.school and _folded(row.get(dataset.school_field)) != _folded(filters.school):
+        return False
+    if filters.date_from or filters.date_to:
+        # Timestamps are stored as "YYYY-MM-DD HH:MM:SS", so the date prefix compares as text.
+        day = (row.get(dataset.date_field) or "").strip()[:10]
+        if not _DATE_RE.match(day):
+            return False
+        if filters.date_from and day < filters.date_from:
+            return False
+        if filters.date_to and day > filters.date_to:
+            return False
+    if filters.investigator:
+        wanted = _folded(filters.investigator)
+        if not any(_folded(row.get(name)) == wanted for name in dataset.investigator_fields):
+            return False
+    if filters.completion and completion_state is not None:
+        if completion_state(row) != filters.completion:
+            return False
+    return True
+
+
+class _LineBuffer:
+    def __init__(self):
+        self.parts: list[str] = []
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+
+    def take(self) -> bytes:
+        data = "".join(self.parts).encode("utf-8")
+        self.parts = []
+        self.size = 0
+        return data
+
+
+def iter_filtered_rows(
+    path: str,
+    dataset: ExportDataset,
+    filters: ExportFilters,
+    completion_state: Callable[[dict], str] | None = None,
+) -> Iterator[dict]:
+    try:
+        f = open(path, "r", newline="", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    # The open handle keeps reading the file it opened even if a writer swaps in a new one.
+    with f:
+        for row in csv.DictReader(f):
+            if row_matches(row, dataset, filters, completion_state):
+                yield row
+
+
+def iter_csv_chunks(rows: Iterable[dict], columns: list[str], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Serialize rows to CSV, yielding roughly ``chunk_bytes`` at a time; the header goes out first."""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.take()
+    for row in rows:
+        writer.writerow([row.get(column, "") for column in columns])
+        if buffer.size >= chunk_bytes:
+            yield buffer.take()
+    if buffer.size:
+        yield buffer.take()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Iterator, Mapping
+
+from change_feed import DELETE, MAX_PAGE_SIZE, Change, ChangeFeed
+
+
+# Browsers reconnect an EventSource on their own; this is how long they wait first (ms).
+RECONNECT_MILLISECONDS = 5000
+# Comment lines keep proxies from closing a stream that has had nothing to say.
+KEEPALIVE_SECONDS = 15.0
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _profile_id(row: Mapping) -> str:
+    return (row.get("profile_id", "") or "").strip().upper()
+
+
+class DashboardCounters:
+    """Admin dashboard totals kept up to date from the change feed instead of full reloads.
+
+    The first read scans the stored tables once (``load_snapshot``, the feed tables as
+    ``{table: {key: non-empty columns}}``); after that each read only applies the feed
+    entries recorded since, so a count costs the same however many children there are.
+    Every key keeps the few facts it contributes (its child, submission day, draft
+    state, Horiba value), so an update or delete takes back exactly what the row added.
+    With the feed turned off, a read scans again whenever ``stamp`` (a dataset version)
+    has moved.
+
+    ``total_linked`` counts children in the linked view: profiles, responses and linked
+    rows, one per profile id. A response is a save-progress draft while ``is_draft``
+    says so, and a child with a response but no Horiba value has results pending.
+    """
+
+    def __init__(
+        self,
+        feed: ChangeFeed,
+        load_snapshot: Callable[[], Mapping[str, Mapping[str, Mapping]]],
+        is_draft: Callable[[Mapping], bool],
+        machine_field: str = "horiba",
+        stamp: Callable[[], object] | None = None,
+    ):
+        self.feed = feed
+        self.load_snapshot = load_snapshot
+        self.stamp = stamp
+        self._stamp: object = None
+        self.is_draft = is_draft
+        self.machine_field = machine_field
+        self.seq = 0
+        self._seeded = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._generation = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._profiles: dict[str, str] = {}
+        self._responses: dict[str, tuple[str, str, bool]] = {}
+        self._linked: dict[str, str] = {}
+        self._machine: dict[str, str] = {}
+        self._measured: dict[str, str] = {}
+        # Sources (profile, response, linked row, machine results) per child; a child is in the linked view while it has one.
+        self._children: Counter[str] = Counter()
+        self._responded: Counter[str] = Counter()
+        self._days: Counter[str] = Counter()
+        self._drafts = 0
+        self._pending = 0
+
+    def reset(self) -> None:
+        """Forget everything; the next read scans the stored tables again (e.g. after a relocate)."""
+        with self._lock:
+            self._seeded = False
+
+    # Keeping the pending count in step: a child is pending while it has a response and no value.
+    def _pending_for(self, child: str) -> int:
+        return int(bool(child) and self._responded[child] > 0 and child not in self._measured)
+
+    def _set_child(self, sources: Counter, child: str, delta: int) -> None:
+        if not child:
+            return
+        before = self._pending_for(child)
+        sources[child] += delta
+        if sources[child] <= 0:
+            del sources[child]
+        self._pending += self._pending_for(child) - before
+
+    def _apply(self, table: str, key: str, data: Mapping | None) -> None:
+        """Replace what ``key`` of ``table`` contributes with the facts of ``data`` (None: deleted)."""
+        if table == "profiles":
+            old = self._profiles.pop(key, None)
+            if old is not None:
+                self._set_child(self._children, old, -1)
+            if data is not None:
+                self._profiles[key] = _profile_id(data) or key.strip().upper()
+                self._set_child(self._children, self._profiles[key], 1)
+        elif table == "responses":
+            old = self._responses.pop(key, None)
+            if old is not None:
+                child, day, draft = old
+                self._set_child(self._children, child, -1)
+                self._set_child(self._responded, child, -1)
+                self._days[day] -= 1
+                self._drafts -= draft
+            if data is not None:
+                child = _profile_id(data)
+                day = (data.get("submitted_at", "") or "")[:10]
+                draft = bool(self.is_draft(data))
+                self._responses[key] = (child, day, draft)
+                self._set_child(self._children, child, 1)
+                self._set_child(self._responded, child, 1)
+                self._days[day] += 1
+                self._drafts += draft
+        elif table == "linked":
+            old = self._linked.pop(key, None)
+            if old is not None:
+                self._set_child(self._children, old, -1)
+            if data is not None:
+                self._linked[key] = key.strip().upper()
+                self._set_child(self._children, self._linked[key], 1)
+        elif table == "machine":
+            # A linked row holding nothing but machine results is still in the linked view.
+            child = key.strip().upper()
+            if self._machine.pop(key, None) is not None:
+                self._set_child(self._children, child, -1)
+            before = self._pending_for(child)
+            self._measured.pop(child, None)
+            if data is not None:
+                self._machine[key] = child
+                if data.get(self.machine_field):
+                    self._measured[child] = data[self.machine_field]
+            self._pending += self._pending_for(child) - before
+            if data is not None:
+                self._set_child(self._children, child, 1)
+
+    def _seed(self) -> None:
+        self._reset()
+        self._stamp = self.stamp() if self.stamp is not None else None
+        # Taken before the scan: changes that land during it are applied again, which is harmless.
+        _, seq = self.feed.bounds() if self.feed.enabled else (0, 0)
+        for table, rows in self.load_snapshot().items():
+            for key, data in rows.items():
+                self._apply(table, key, data)
+        self.seq = seq
+        self._seeded = True
+
+    def _advance(self) -> None:
+        if not self._seeded:
+            self._seed()
+            return
+        if not self.feed.enabled:
+            # Without a feed the only way to catch up is another scan, done when ``stamp`` moves.
+            if self.stamp is None or self.stamp() != self._stamp:
+                self._seed()
+            return
+        oldest, latest = self.feed.bounds()
+        if oldest and self.seq < oldest - 1:
+            # The feed was pruned past what we have applied.
+            self._seed()
+            return
+        while self.seq < latest:
+            changes: list[Change] = self.feed.read(self.seq, MAX_PAGE_SIZE)
+            if not changes:
+                break
+            for change in changes:
+                self._apply(change.table, change.key, None if change.op == DELETE else change.data)
+            self.seq = changes[-1].seq
+
+    def counts(self, today: str | None = None) -> dict[str, int]:
+        """Current counters; ``today`` is a ``YYYY-MM-DD`` date (default: the local date)."""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            self._advance()
+            return {
+                "total_profiles": len(self._profiles),
+                "total_responses": len(self._responses),
+                "total_linked": len(self._children),
+                "today_submissions": self._days[today],
+                "save_progress_drafts": self._drafts,
+                "horiba_pending": self._pending,
+            }
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def notify(self) -> None:
+        """Wake the streams waiting in ``wait``; called after this process records a write."""
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> int:
+        """Block until ``notify`` moves past ``generation`` or ``timeout`` passes; returns the current generation."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._generation != generation, timeout)
+            return self._generation
+
+    def stream(self, duration: float, poll_seconds: float) -> Iterator[str]:
+        """Server-Sent Events: a ``counters`` event now and whenever a counter changes.
+
+        Writes in this process wake the stream at once; writes in other workers are
+        picked up by checking the feed every ``poll_seconds``. The stream ends after
+        ``duration`` seconds and the browser reconnects, so a forgotten tab does not
+        hold a request thread forever and the admin login is checked again.
+        """
+        yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+        deadline = time.monotonic() + duration
+        generation = self.generation
+        last = None
+        quiet_since = time.monotonic()
+        while time.monotonic() < deadline:
+            counts = self.counts()
+            if counts != last:
+                last = counts
+                quiet_since = time.monotonic()
+                yield sse_event("counters", counts)
+            elif time.monotonic() - quiet_since >= KEEPALIVE_SECONDS:
+                quiet_since = time.monotonic()
+                yield ": keepalive\n\n"
+            generation = self.wait(generation, min(poll_seconds, max(0.0, deadline - time.monotonic())))
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+from csv_export import ExportDataset, ExportError, ExportFilters, parse_export_filters, row_matches
+
+
+DEFAULT_PAGE_ROWS = 100
+MAX_PAGE_ROWS = 1000
+# Filtered and sorted views kept per worker; scrolling through one view reuses it.
+VIEW_CACHE_SIZE = 16
+
+
+class ApiError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ApiDataset:
+    """One table behind the data API.
+
+    ``load`` returns the rows and their field list; ``version`` is any value that changes
+    whenever the rows may have (a dataset version from the file stamps). ``filters``
+    names the fields the shared school/date/investigator/completion filters use.
+    Rows without a ``key_field`` (append-only logs) are keyed by their position.
+    """
+
+    name: str
+    load: Callable[[], tuple[list[dict], list[str]]]
+    version: Callable[[], object]
+    filters: ExportDataset
+    key_field: str = ""
+    default_sort: tuple[str, ...] = ()
+    search_fields: tuple[str, ...] = ()
+    completion_state: Callable[[dict], str] | None = None
+
+
+@dataclass
+class ApiQuery:
+    fields: list[str]
+    filters: ExportFilters
+    where: list[tuple[str, str]] = field(default_factory=list)
+    search: str = ""
+    sort: list[tuple[str, bool]] = field(default_factory=list)
+    limit: int = DEFAULT_PAGE_ROWS
+    offset: int | None = None
+    cursor: tuple[str, int] | None = None
+
+    def view_key(self) -> tuple:
+        filters = self.filters
+        return (
+            filters.school, filters.date_from, filters.date_to, filters.investigator, filters.completion,
+            tuple(self.where), self.search, tuple(self.sort),
+        )
+
+
+def _folded(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _split(args, name: str) -> list[str]:
+    values = []
+    for value in args.getlist(name):
+        values.extend(part.strip() for part in value.split(",") if part.strip())
+    return values
+
+
+def encode_cursor(key: str, index: int) -> str:
+    raw = json.dumps([key, index], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(text: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+        key, index = json.loads(raw)
+        return str(key), int(index)
+    except (ValueError, TypeError):
+        raise ApiError("'cursor' is not a cursor returned by this API.") from None
+
+
+def _sort_value(value) -> tuple:
+    # Empty cells go last in either direction; numbers compare as numbers, the rest as folded text.
+    text = str(value or "").strip()
+    try:
+        number = float(text)
+    except ValueError:
+        number = math.nan
+    if math.isfinite(number):
+        return (not text, 0, number, "")
+    return (not text, 1, 0.0, text.casefold())
+
+
+def parse_query(args, dataset: ApiDataset, fields: list[str]) -> ApiQuery:
+    """Validate query arguments (a werkzeug MultiDict) against ``dataset`` and its current ``fields``."""
+    known = set(fields)
+    try:
+        filters = parse_export_filters(args, dataset.filters)
+    except ExportError as e:
+        raise ApiError(str(e)) from None
+
+    requested = list(dict.fromkeys(_split(args, "fields")))
+    unknown = [name for name in requested if name not in known]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+
+    where = []
+    for value in args.getlist("filter"):
+        name, sep, wanted = value.partition(":")
+        if not sep or name.strip() not in known:
+            raise ApiError("'filter' must be field:value with a known field.")
+        where.append((name.strip(), _folded(wanted)))
+
+    sort = []
+    for name in _split(args, "sort") or list(dataset.default_sort):
+        descending = name.startswith("-")
+        name = name.lstrip("-+")
+        if name not in known:
+            raise ApiError(f"Cannot sort by unknown field '{name}'.")
+        sort.append((name, descending))
+
+    try:
+        limit = int(args.get("limit") or DEFAULT_PAGE_ROWS)
+        offset = int(args["offset"]) if args.get("offset") else None
+    except ValueError:
+        raise ApiError("'limit' and 'offset' must be integers.") from None
+    if not 1 <= limit <= MAX_PAGE_ROWS:
+        raise ApiError(f"'limit' must be between 1 and {MAX_PAGE_ROWS}.")
+    if offset is not None and offset < 0:
+        raise ApiError("'offset' cannot be negative.")
+    cursor = decode_cursor(args["cursor"]) if args.get("cursor") else None
+    if cursor is not None and offset is not None:
+        raise ApiError("Pass either 'cursor' or 'offset', not both.")
+
+    return ApiQuery(
+        fields=requested or list(fields),
+        filters=filters,
+        where=where,
+        search=_folded(args.get("q")),
+        sort=sort,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
+
+
+class _View:
+    """Filtered, sorted rows of one dataset version, with each row's position by key."""
+
+    def __init__(self, entries: list[tuple[str, dict]]):
+        self.entries = entries
+        self.positions = {key: index for index, (key, _) in enumerate(entries)}
+
+    def after(self, key: str, index: int) -> int:
+        """Where a page continues after the cursor row ``(key, index)``.
+
+        The stored index wins while it still holds that key: keys need not be unique
+        (rows sharing one would otherwise resume after the last of them).
+        """
+        if 0 <= index < len(self.entries) and self.entries[index][0] == key:
+            return index + 1
+        return self.positions.get(key, index) + 1
+
+
+class DataApi:
+    """Read-only pages over the admin datasets: projection, filters, sort, cursors and ETags.
+
+    A dataset is loaded once per version and each distinct filter/sort combination is
+    kept as a view, so scrolling a grid costs one slice per page instead of a reload.
+    Pages carry only the requested fields, as arrays in ``fields`` order.
+
+    Cursors hold the last row's key and position. They survive writes: a cursor into
+    an older version continues after the same row in the current one (or at its old
+    position if that row is gone). ``offset`` is for jumping straight to a row, as a
+    virtualized grid does when scrolled.
+    """
+
+    def __init__(self, datasets: list[ApiDataset], cache_size: int = VIEW_CACHE_SIZE):
+        self.datasets = {dataset.name: dataset for dataset in datasets}
+        self.cache_size = cache_size
+        self._loaded: dict[str, tuple[object, list[dict], list[str]]] = {}
+        self._views: OrderedDict[tuple, _View] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded.clear()
+            self._views.clear()
+
+    def dataset(self, name: str) -> ApiDataset:
+        dataset = self.datasets.get(name)
+        if dataset is None:
+            raise ApiError(f"Unknown dataset '{name}'.")
+        return dataset
+
+    def etag(self, name: str, args) -> str:
+        """Changes with the dataset version and the query; cheap enough to check before any work."""
+        dataset = self.dataset(name)
+        query = sorted((key, value) for key, value in args.items(multi=True))
+        return hashlib.blake2b(repr((name, dataset.version(), query)).encode("utf-8"), digest_size=12).hexdigest()
+
+    def _load(self, dataset: ApiDataset) -> tuple[object, list[dict], list[str]]:
+        version = dataset.version()
+        with self._lock:
+            loaded = self._loaded.get(dataset.name)
+        if loaded is not None and loaded[0] == version:
+            return loaded
+        rows, fields = dataset.load()
+        loaded = (version, rows, list(fields))
+        with self._lock:
+            self._loaded[dataset.name] = loaded
+        return loaded
+
+    def fields(self, name: str) -> list[str]:
+        return self._load(self.dataset(name))[2]
+
+    def _view(self, dataset: ApiDataset, version, rows: list[dict], query: ApiQuery) -> _View:
+        cache_key = (dataset.name, version, query.view_key())
+        with self._lock:
+            view = self._views.get(cache_key)
+            if view is not None:
+                self._views.move_to_end(cache_key)
+                return view
+
+        search_fields = dataset.search_fields
+        entries = []
+        for index, row in enumerate(rows):
+            if not row_matches(row, dataset.filters, query.filters, dataset.completion_state):
+                continue
+            if any(_folded(row.get(name)) != wanted for name, wanted in query.where):
+                continue
+            if query.search and not any(query.search in _folded(row.get(name)) for name in (search_fields or row.keys())):
+                continue
+            entries.append((str(row.get(dataset.key_field, "")) if dataset.key_field else str(index), row))
+        # Stable sorts, last key first, give the combined order.
+        for name, descending in reversed(query.sort):
+            entries.sort(key=lambda entry: _sort_value(entry[1].get(name)), reverse=descending)
+            if descending:
+                # reverse=True also put the empty cells first; move them back to the end.
+                filled = [entry for entry in entries if str(entry[1].get(name) or "").strip()]
+                entries = filled + [entry for entry in entries if not str(entry[1].get(name) or "").strip()]
+
+        view = _View(entries)
+        with self._lock:
+            self._views[cache_key] = view
+            while len(self._views) > self.cache_size:
+                self._views.popitem(last=False)
+        return view
+
+    def page(self, name: str, args) -> dict:
+        dataset = self.dataset(name)
+        version, rows, fields = self._load(dataset)
+        query = parse_query(args, dataset, fields)
+        view = self._view(dataset, version, rows, query)
+
+        if query.cursor is not None:
+            start = view.after(*query.cursor)
+        else:
+            start = query.offset or 0
+        start = min(start, len(view.entries))
+        chunk = view.entries[start:start + query.limit]
+        end = start + len(chunk)
+        has_more = end < len(view.entries)
+        return {
+            "success": True,
+            "dataset": name,
+            "fields": query.fields,
+            "rows": [[row.get(name, "") for name in query.fields] for _, row in chunk],
+            "keys": [key for key, _ in chunk],
+            "total": len(view.entries),
+            "offset": start,
+            "next_cursor": encode_cursor(chunk[-1][0], end - 1) if chunk and has_more else None,
+            "has_more": has_more,
+        }
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+
+DATASET_KEYS = {
+    "profiles": "profile_id",
+    "responses": "response_id",
+    "linked": "profile_id",
+}
+
+_FIELD_SEPARATOR = "\x1f"
+
+
+@dataclass
+class CellChange:
+    field: str
+    before: str
+    after: str
+
+
+@dataclass
+class RowChange:
+    key: str
+    changes: list[CellChange]
+
+
+@dataclass
+class DatasetDiff:
+    dataset: str
+    key_field: str
+    before_rows: int = 0
+    after_rows: int = 0
+    unchanged: int = 0
+    skipped_without_key: int = 0
+    fields_added: list[str] = field(default_factory=list)
+    fields_removed: list[str] = field(default_factory=list)
+    added: list[dict[str, str]] = field(default_factory=list)
+    removed: list[dict[str, str]] = field(default_factory=list)
+    modified: list[RowChange] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.removed or self.modified or self.fields_added or self.fields_removed)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def normalize_key(key_field: str, value: str) -> str:
+    if key_field == "profile_id":
+        return re.sub(r"[^A-Za-z0-9]", "", value or "").upper()
+    return (value or "").strip()
+
+
+def read_header(path: Path) -> list[str]:
+    with path.open("r", newline="", encoding="utf-8-sig") as handle:
+        reader = csv.reader(handle)
+        header = next(reader, [])
+    return [str(name).strip() for name in header]
+
+
+def _iter_rows(path: Path):
+    with path.open("r", newline="", encoding="utf-8-sig") as handle:
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield {str(k).strip(): (v or "") for k, v in row.items() if k is not None}
+
+
+def _row_digest(row: dict[str, str], fields: list[str]) -> bytes:
+    payload = _FIELD_SEPARATOR.join(row.get(name, "") for name in fields)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+def hash_rows(path: Path, key_field: str, fields: list[str]) -> tuple[dict[str, bytes], int, int]:
+    """First pass: one 16-byte digest per key. Later rows win, like the app's storage."""
+    digests: dict[str, bytes] = {}
+    total = 0
+    skipped = 0
+    for row in _iter_rows(path):
+        total += 1
+        key = normalize_key(key_field, row.get(key_field, ""))
+        if not key:
+            skipped += 1
+            continue
+        digests[key] = _row_digest(row, fields)
+    return digests, total, skipped
+
+
+def collect_rows(path: Path, key_field: str, wanted: set[str]) -> dict[str, dict[str, str]]:
+    """Second pass: materialize only the rows whose digests differ."""
+    rows: dict[str, dict[str, str]] = {}
+    if not wanted:
+        return rows
+    for row in _iter_rows(path):
+        key = normalize_key(key_field, row.get(key_field, ""))
+        if key in wanted:
+            rows[key] = row
+    return rows
+
+
+def diff_csv_files(
+    before_path: Path | str,
+    after_path: Path | str,
+    dataset: str = "profiles",
+    key_field: str | None = None,
+) -> DatasetDiff:
+    before_path = Path(before_path)
+    after_path = Path(after_path)
+    key_field = key_field or DATASET_KEYS.get(dataset, "profile_id")
+
+    before_fields = read_header(before_path)
+    after_fields = read_header(after_path)
+    before_set = set(before_fields)
+    after_set = set(after_fields)
+    compare_fields = before_fields + [name for name in after_fields if name not in before_set]
+
+    result = DatasetDiff(dataset=dataset, key_field=key_field)
+    result.fields_added = [name for name in after_fields if name not in before_set]
+    result.fields_removed = [name for name in before_fields if name not in after_set]
+
+    before_digests, result.before_rows, skipped_before = hash_rows(before_path, key_field, compare_fields)
+    after_digests, result.after_rows, skipped_after = hash_rows(after_path, key_field, compare_fields)
+    result.skipped_without_key = skipped_before + skipped_after
+
+    removed_keys = before_digests.keys() - after_digests.keys()
+    added_keys = after_digests.keys() - before_digests.keys()
+    changed_keys = {
+        key for key, digest in after_digests.items()
+        if key in before_digests and before_digests[key] != digest
+    }
+    result.unchanged = len(after_digests) - len(added_keys) - len(changed_keys)
+
+    before_rows = collect_rows(before_path, key_field, removed_keys | changed_keys)
+    after_rows = collect_rows(after_path, key_field, added_keys | changed_keys)
+
+    result.removed = [before_rows[key] for key in sorted(removed_keys)]
+    result.added = [after_rows[key] for key in sorted(added_keys)]
+    for key in sorted(changed_keys):
+        old_row = before_rows.get(key, {})
+        new_row = after_rows.get(key, {})
+        changes = [
+            CellChange(field=name, before=old_row.get(name, ""), after=new_row.get(name, ""))
+            for name in compare_fields
+            if old_row.get(name, "") != new_row.get(name, "")
+        ]
+        if changes:
+            result.modified.append(RowChange(key=key, changes=changes))
+    return result
+
+
+def format_summary(result: DatasetDiff, max_rows: int = 20) -> str:
+    lines = [
+        f"Dataset: {result.dataset} (key: {result.key_field})",
+        f"Rows before: {result.before_rows}, after: {result.after_rows}",
+        f"Added: {len(result.added)}, removed: {len(result.removed)}, "
+        f"modified: {len(result.modified)}, unchanged: {result.unchanged}",
+    ]
+    if result.skipped_without_key:
+        lines.append(f"Rows skipped without {result.key_field}: {result.skipped_without_key}")
+    if result.fields_added:
+        lines.append(f"Columns added: {', '.join(result.fields_added)}")
+    if result.fields_removed:
+        lines.append(f"Columns removed: {', '.join(result.fields_removed)}")
+    for row in result.added[:max_rows]:
+        lines.append(f"+ {row.get(result.key_field, '')}")
+    for row in result.removed[:max_rows]:
+        lines.append(f"- {row.get(result.key_field, '')}")
+    for change in result.modified[:max_rows]:
+        lines.append(f"~ {change.key}")
+        for cell in change.changes:
+            lines.append(f"    {cell.field}: {cell.before!r} -> {cell.after!r}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Diff two CSV snapshots of profiles, responses or linked data.")
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--dataset", choices=sorted(DATASET_KEYS), default="profiles")
+    parser.add_argument("--key", dest="key_field", default=None, help="Override the key column.")
+    parser.add_argument("--json", dest="json_path", type=Path, default=None, help="Write the full diff as JSON.")
+    parser.add_argument("--max-rows", type=int, default=20, help="Rows per section in the text summary.")
+    args = parser.parse_args(argv)
+
+    result = diff_csv_files(args.before, args.after, dataset=args.dataset, key_field=args.key_field)
+    sys.stdout.write(format_summary(result, max_rows=args.max_rows))
+    if args.json_path:
+        args.json_path.write_text(json.dumps(result.to_dict(), indent=2), encoding="utf-8")
+    return 1 if result.has_changes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
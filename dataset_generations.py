@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import AbstractContextManager
+from typing import Callable, Hashable, Iterable
+
+
+class GenerationTable:
+    """Per-dataset generation counters shared by every worker process.
+
+    The table is a small JSON file next to the data. Writers bump a dataset's
+    counter (under ``lock``) after they replace or append to its file; readers
+    compare counters to decide whether their in-memory copy is still current.
+    Reading is one ``os.stat`` unless the table itself changed.
+    """
+
+    def __init__(self, path: str, lock: Callable[[str], AbstractContextManager] | None = None):
+        self.path = path
+        self._lock = lock
+        self._stamp: tuple[int, int, int] | None = None
+        self._generations: dict[str, int] = {}
+        self._local_lock = threading.Lock()
+
+    def relocate(self, path: str) -> None:
+        with self._local_lock:
+            self.path = path
+            self._stamp = None
+            self._generations = {}
+
+    def _load(self) -> dict[str, int]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return {}
+        # The table is replaced atomically, so the inode changes on every bump.
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._local_lock:
+            if stamp != self._stamp:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        loaded = json.load(f)
+                except (OSError, ValueError):
+                    loaded = {}
+                self._generations = {str(k): int(v) for k, v in loaded.items()}
+                self._stamp = stamp
+            return self._generations
+
+    def get(self, name: str) -> int:
+        return self._load().get(name, 0)
+
+    def snapshot(self) -> dict[str, int]:
+        return dict(self._load())
+
+    def bump(self, names: Iterable[str]) -> dict[str, int]:
+        names = [name for name in names if name]
+        if not names:
+            return {}
+        if self._lock is None:
+            return self._bump(names)
+        with self._lock(self.path):
+            return self._bump(names)
+
+    def _bump(self, names: list[str]) -> dict[str, int]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                generations = {str(k): int(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            generations = {}
+        for name in names:
+            generations[name] = generations.get(name, 0) + 1
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix="tmp_gen_", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(generations, f, sort_keys=True)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return {name: generations[name] for name in names}
+
+
+class VersionedCache:
+    """Worker-local cache whose entries are reused only while their version is unchanged."""
+
+    def __init__(self):
+        self._entries: dict[Hashable, tuple[Hashable, object]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, loader: Callable[[], object]) -> tuple[object, bool]:
+        """Return ``(value, hit)``; ``loader`` runs only when the version moved."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], True
+        value = loader()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value, False
+
+    def peek(self, key: Hashable, version: Hashable) -> object | None:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from collections import ChainMap
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Iterable, Mapping
+
+
+PROFILE_CONTEXT_PREFIX = "profile."
+PROFILE_CONTEXT_FIELDS = ["profile_id", "name", "surname", "dob", "gender", "school", "location"]
+
+
+@dataclass(frozen=True)
+class DerivedField:
+    name: str
+    inputs: tuple[str, ...]
+    formula: Callable[[Mapping[str, str]], str]
+
+
+class DerivedFieldEngine:
+    """Recomputes derived columns from their declared inputs.
+
+    Fields are evaluated in dependency order, so a derived field may itself
+    be the input of another one. Passing ``changed`` limits the work to the
+    fields that (transitively) depend on those inputs.
+    """
+
+    def __init__(self, fields: Iterable[DerivedField]):
+        self.fields = {field.name: field for field in fields}
+        self._dependents: dict[str, set[str]] = {}
+        for field in self.fields.values():
+            for input_name in field.inputs:
+                self._dependents.setdefault(input_name, set()).add(field.name)
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list[str]:
+        order: list[str] = []
+        state: dict[str, str] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Derived field cycle detected at {name}")
+            state[name] = "visiting"
+            for input_name in self.fields[name].inputs:
+                if input_name in self.fields:
+                    visit(input_name)
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.fields:
+            visit(name)
+        return order
+
+    @property
+    def inputs(self) -> set[str]:
+        return set(self._dependents)
+
+    def affected_by(self, changed: Iterable[str]) -> list[str]:
+        pending: set[str] = set()
+        frontier = list(changed)
+        while frontier:
+            key = frontier.pop()
+            for name in self._dependents.get(key, ()):
+                if name not in pending:
+                    pending.add(name)
+                    frontier.append(name)
+        return [name for name in self.order if name in pending]
+
+    def recompute(
+        self,
+        row: dict[str, str],
+        changed: Iterable[str] | None = None,
+        context: Mapping[str, str] | None = None,
+    ) -> list[str]:
+        """Update ``row`` in place and return the names of fields whose value changed."""
+        names = self.order if changed is None else self.affected_by(changed)
+        if not names:
+            return []
+        values = ChainMap(row, dict(context or {}))
+        updated = []
+        for name in names:
+            new_value = self.fields[name].formula(values)
+            if (row.get(name, "") or "") != new_value:
+                row[name] = new_value
+                updated.append(name)
+        return updated
+
+    def recompute_all(
+        self,
+        rows: Iterable[dict[str, str]],
+        changed: Iterable[str] | None = None,
+        context_for: Callable[[dict[str, str]], Mapping[str, str] | None] | None = None,
+    ) -> int:
+        """Batch recomputation, e.g. after a formula change. Returns the number of rows touched."""
+        changed = list(changed) if changed is not None else None
+        touched = 0
+        for row in rows:
+            context = context_for(row) if context_for else None
+            if self.recompute(row, changed=changed, context=context):
+                touched += 1
+        return touched
+
+
+def profile_context(profile: Mapping[str, str] | None) -> dict[str, str]:
+    if not profile:
+        return {}
+    return {
+        f"{PROFILE_CONTEXT_PREFIX}{field}": (profile.get(field, "") or "").strip()
+        for field in PROFILE_CONTEXT_FIELDS
+    }
+
+
+def parse_date(value: str) -> date | None:
+    text = (value or "").strip()
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            parsed = datetime.strptime(text, fmt)
+            return parsed.date()
+        except ValueError:
+            continue
+    return None
+
+
+def format_age_full(dob_value: str, ref_value: str) -> str:
+    dob = parse_date(dob_value)
+    ref = parse_date(ref_value)
+    if not dob or not ref or ref < dob:
+        return ""
+
+    years = ref.year - dob.year
+    months = ref.month - dob.month
+    days = ref.day - dob.day
+
+    if days < 0:
+        months -= 1
+        previous_month = ref.month - 1 or 12
+        previous_year = ref.year if ref.month > 1 else ref.year - 1
+        if previous_month == 12:
+            next_month = date(previous_year + 1, 1, 1)
+        else:
+            next_month = date(previous_year, previous_month + 1, 1)
+        current_month = date(previous_year, previous_month, 1)
+        days_in_previous_month = (next_month - current_month).days
+        days += days_in_previous_month
+
+    if months < 0:
+        years -= 1
+        months += 12
+
+    return f"{years} years {months} months {days} days"
+
+
+def age_in_years(dob_value: str, ref_value: str) -> int | None:
+    dob = parse_date(dob_value)
+    ref = parse_date(ref_value)
+    if not dob or not ref or ref < dob:
+        return None
+    return ref.year - dob.year - ((ref.month, ref.day) < (dob.month, dob.day))
+
+
+def ifa_dose_for_weight(weight_value: str) -> str:
+    # Questionnaire formula: 3 * body weight / 20 (ml/day)
+    try:
+        weight = float((weight_value or "").strip())
+    except (TypeError, ValueError):
+        return ""
+    if weight <= 0:
+        return ""
+    dose = round((3 * weight) / 20, 2)
+    return f"{dose:g} ml/day"
+
+
+def _profile_age(values: Mapping[str, str]) -> str:
+    years = age_in_years(values.get("dob", ""), values.get("created_at", ""))
+    return str(years) if years is not None else (values.get("age", "") or "")
+
+
+def _profile_age_full(values: Mapping[str, str]) -> str:
+    return format_age_full(values.get("dob", ""), values.get("created_at", "")) or (values.get("age_full", "") or "")
+
+
+def _from_profile(target: str, build: Callable[[Mapping[str, str]], str]) -> Callable[[Mapping[str, str]], str]:
+    """Identity values come from the linked profile; without one the stored value is kept."""
+    def formula(values: Mapping[str, str]) -> str:
+        if f"{PROFILE_CONTEXT_PREFIX}profile_id" not in values:
+            return values.get(target, "") or ""
+        return build(values)
+    return formula
+
+
+def _profile_value(field: str) -> Callable[[Mapping[str, str]], str]:
+    return lambda values: values.get(f"{PROFILE_CONTEXT_PREFIX}{field}", "")
+
+
+def _participant_name(values: Mapping[str, str]) -> str:
+    return f"{values.get('profile.name', '')} {values.get('profile.surname', '')}".strip()
+
+
+def _study_identifier(target: str) -> Callable[[Mapping[str, str]], str]:
+    def formula(values: Mapping[str, str]) -> str:
+        profile_id = (values.get("profile_id", "") or "").strip().upper()
+        return profile_id or (values.get(target, "") or "")
+    return formula
+
+
+PROFILE_DERIVED = DerivedFieldEngine([
+    DerivedField("age", ("dob", "created_at"), _profile_age),
+    DerivedField("age_full", ("dob", "created_at"), _profile_age_full),
+])
+
+RESPONSE_IDENTITY_INPUTS = ["profile_id"] + [f"{PROFILE_CONTEXT_PREFIX}{field}" for field in PROFILE_CONTEXT_FIELDS]
+
+RESPONSE_DERIVED = DerivedFieldEngine([
+    DerivedField(
+        "ifa_dose",
+        ("weight_kgs", "weight_kg"),
+        lambda values: ifa_dose_for_weight(values.get("weight_kgs", "") or values.get("weight_kg", "")),
+    ),
+    DerivedField("study_id", ("profile_id",), _study_identifier("study_id")),
+    DerivedField("child_id_code", ("profile_id",), _study_identifier("child_id_code")),
+    DerivedField("participant_name", ("profile.profile_id", "profile.name", "profile.surname"), _from_profile("participant_name", _participant_name)),
+    DerivedField("dob", ("profile.profile_id", "profile.dob"), _from_profile("dob", _profile_value("dob"))),
+    DerivedField("sex", ("profile.profile_id", "profile.gender"), _from_profile("sex", _profile_value("gender"))),
+    DerivedField("school_anganwadi_name", ("profile.profile_id", "profile.school"), _from_profile("school_anganwadi_name", _profile_value("school"))),
+    DerivedField("location_type", ("profile.profile_id", "profile.location"), _from_profile("location_type", _profile_value("location"))),
+])
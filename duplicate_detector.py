@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+
+DEFAULT_THRESHOLD = 0.8
+NAME_WEIGHT = 0.7
+SCHOOL_WEIGHT = 0.2
+LOCATION_WEIGHT = 0.1
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+
+@dataclass
+class DuplicateCandidate:
+    profile_id: str
+    other_profile_id: str
+    score: float
+    name_similarity: float
+    block_key: tuple[str, str, str]
+    profile: dict[str, str]
+    other_profile: dict[str, str]
+
+
+def _letters(text: str) -> str:
+    return re.sub(r"[^A-Z]", "", (text or "").upper())
+
+
+def _words(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").casefold()))
+
+
+def soundex(text: str) -> str:
+    letters = _letters(text)
+    if not letters:
+        return ""
+    first = letters[0]
+    encoded = [first]
+    previous = _SOUNDEX_CODES.get(first, "")
+    for ch in letters[1:]:
+        code = _SOUNDEX_CODES.get(ch, "")
+        if code and code != previous:
+            encoded.append(code)
+        # H and W do not separate letters with the same code; vowels do.
+        if ch not in "HW":
+            previous = code
+        if len(encoded) == 4:
+            break
+    return "".join(encoded).ljust(4, "0")
+
+
+def levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    if not a and not b:
+        return 1.0
+    longest = max(len(a), len(b))
+    return 1.0 - levenshtein(a, b) / longest
+
+
+def full_name_key(profile: dict[str, str]) -> str:
+    return _letters(f"{profile.get('name', '')}{profile.get('surname', '')}")
+
+
+def blocking_key(profile: dict[str, str]) -> tuple[str, str, str]:
+    """DOB + gender initial + Soundex of the first name. Rows only get compared inside a block."""
+    dob = (profile.get("dob", "") or "").strip()
+    gender = _letters(profile.get("gender", ""))[:1]
+    return dob, gender, soundex(profile.get("name", ""))
+
+
+def score_pair(left: dict[str, str], right: dict[str, str]) -> tuple[float, float]:
+    name_score = similarity(full_name_key(left), full_name_key(right))
+    school_score = similarity(_words(left.get("school", "")), _words(right.get("school", "")))
+    location_score = similarity(_words(left.get("location", "")), _words(right.get("location", "")))
+    total = NAME_WEIGHT * name_score + SCHOOL_WEIGHT * school_score + LOCATION_WEIGHT * location_score
+    return round(total, 4), round(name_score, 4)
+
+
+def _profile_id(profile: dict[str, str]) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "", profile.get("profile_id", "") or "").upper()
+
+
+def build_blocks(profiles: list[dict[str, str]]) -> dict[tuple[str, str, str], list[dict[str, str]]]:
+    blocks: dict[tuple[str, str, str], list[dict[str, str]]] = defaultdict(list)
+    for profile in profiles:
+        key = blocking_key(profile)
+        if key[0] and key[2]:
+            blocks[key].append(profile)
+    return blocks
+
+
+def _is_known_alias(left_id: str, right_id: str, known_aliases: dict[str, str] | None) -> bool:
+    if not known_aliases:
+        return False
+    return known_aliases.get(left_id) == right_id or known_aliases.get(right_id) == left_id
+
+
+def find_duplicate_pairs(
+    profiles: list[dict[str, str]],
+    threshold: float = DEFAULT_THRESHOLD,
+    known_aliases: dict[str, str] | None = None,
+) -> list[DuplicateCandidate]:
+    candidates = []
+    for key, members in build_blocks(profiles).items():
+        if len(members) < 2:
+            continue
+        for i, left in enumerate(members):
+            left_id = _profile_id(left)
+            for right in members[i + 1:]:
+                right_id = _profile_id(right)
+                if left_id == right_id or _is_known_alias(left_id, right_id, known_aliases):
+                    continue
+                score, name_score = score_pair(left, right)
+                if score >= threshold:
+                    candidates.append(DuplicateCandidate(
+                        profile_id=left_id,
+                        other_profile_id=right_id,
+                        score=score,
+                        name_similarity=name_score,
+                        block_key=key,
+                        profile=left,
+                        other_profile=right,
+                    ))
+    candidates.sort(key=lambda item: (-item.score, item.profile_id, item.other_profile_id))
+    return candidates
+
+
+def find_possible_duplicates(
+    profile: dict[str, str],
+    existing_profiles: list[dict[str, str]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[DuplicateCandidate]:
+    """Fast check for a single new profile: only rows sharing its block get scored."""
+    key = blocking_key(profile)
+    if not key[0] or not key[2]:
+        return []
+    new_id = _profile_id(profile)
+    candidates = []
+    for existing in existing_profiles:
+        if blocking_key(existing) != key:
+            continue
+        existing_id = _profile_id(existing)
+        if new_id and existing_id == new_id:
+            continue
+        score, name_score = score_pair(profile, existing)
+        if score >= threshold:
+            candidates.append(DuplicateCandidate(
+                profile_id=new_id,
+                other_profile_id=existing_id,
+                score=score,
+                name_similarity=name_score,
+                block_key=key,
+                profile=profile,
+                other_profile=existing,
+            ))
+    candidates.sort(key=lambda item: -item.score)
+    return candidates
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report likely duplicate child profiles.")
+    parser.add_argument("profiles", type=Path, nargs="?", default=Path(__file__).resolve().parent / "profiles.csv")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--output", type=Path, default=None, help="Write the report as CSV.")
+    args = parser.parse_args(argv)
+
+    with args.profiles.open("r", newline="", encoding="utf-8-sig") as handle:
+        profiles = [dict(row) for row in csv.DictReader(handle)]
+
+    pairs = find_duplicate_pairs(profiles, threshold=args.threshold)
+    fieldnames = ["profile_id", "other_profile_id", "score", "name_similarity", "dob", "name", "other_name", "school", "other_school"]
+    report_rows = [
+        {
+            "profile_id": pair.profile_id,
+            "other_profile_id": pair.other_profile_id,
+            "score": pair.score,
+            "name_similarity": pair.name_similarity,
+            "dob": pair.block_key[0],
+            "name": f"{pair.profile.get('name', '')} {pair.profile.get('surname', '')}".strip(),
+            "other_name": f"{pair.other_profile.get('name', '')} {pair.other_profile.get('surname', '')}".strip(),
+            "school": pair.profile.get("school", ""),
+            "other_school": pair.other_profile.get("school", ""),
+        }
+        for pair in pairs
+    ]
+    handle = args.output.open("w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(handle, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(report_rows)
+    finally:
+        if args.output:
+            handle.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from contextlib import AbstractContextManager, ExitStack, nullcontext
+from typing import Callable
+
+
+BUILT = "built"
+CURRENT = "current"
+# Another worker held the build lock and the caller chose not to wait for it.
+DEFERRED = "deferred"
+# A hit only rewrites the manifest when its recorded use is older than this; LRU
+# eviction does not need finer resolution than that.
+TOUCH_INTERVAL_SECONDS = 60.0
+
+
+class ExportCache:
+    """Remembers which source version each export artifact was built from.
+
+    An artifact (an XLSX next to the data, a filtered export in ``exports/``) is
+    reused while its recorded version matches the current one and the file on
+    disk is the one that was recorded. Otherwise it is rebuilt into a temp file
+    and swapped in. The manifest is a JSON file shared by every worker process.
+    """
+
+    def __init__(self, manifest_path: str, lock: Callable[[str], AbstractContextManager] | None = None):
+        self.manifest_path = manifest_path
+        self._lock = lock
+
+    def relocate(self, manifest_path: str) -> None:
+        self.manifest_path = manifest_path
+
+    def _locked(self, path: str) -> AbstractContextManager:
+        return self._lock(path) if self._lock is not None else nullcontext()
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return loaded if isinstance(loaded, dict) else {}
+
+    def _save(self, entries: dict[str, dict]) -> None:
+        directory = os.path.dirname(self.manifest_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix="tmp_exports_", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, sort_keys=True)
+            os.replace(temp_path, self.manifest_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _update(self, mutate: Callable[[dict[str, dict]], None]) -> None:
+        with self._locked(self.manifest_path):
+            entries = self._load()
+            mutate(entries)
+            self._save(entries)
+
+    @staticmethod
+    def _key(version) -> object:
+        # Versions are tuples in memory and lists once they have been through JSON.
+        return json.loads(json.dumps(version, default=str))
+
+    @staticmethod
+    def _file_stamp(path: str) -> list[int] | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _current_entry(self, artifact: str, version) -> dict | None:
+        entry = self._load().get(os.path.abspath(artifact))
+        if not entry:
+            return None
+        stamp = self._file_stamp(artifact)
+        if stamp is None or entry.get("stamp") != stamp or entry.get("version") != self._key(version):
+            return None
+        return entry
+
+    def is_current(self, artifact: str, version) -> bool:
+        return self._current_entry(artifact, version) is not None
+
+    def ensure(self, artifact: str, version, build: Callable[[str], None], wait: bool = True) -> str:
+        """Make sure ``artifact`` matches ``version``; returns BUILT, CURRENT or DEFERRED.
+
+        ``build`` receives a temp path in the artifact's directory and writes the file there.
+        With ``wait=False`` a busy build lock means DEFERRED instead of queueing behind it
+        (the lock callable must accept ``timeout_seconds=0`` and raise TimeoutError).
+        """
+        entry = self._current_entry(artifact, version)
+        if entry is not None:
+            self.touch(artifact, entry)
+            return CURRENT
+        directory = os.path.dirname(artifact) or "."
+        os.makedirs(directory, exist_ok=True)
+        # One build lock per directory, so evicted artifacts do not leave lock files behind.
+        build_key = os.path.join(directory, "export_build")
+        if wait or self._lock is None:
+            lock = self._locked(build_key)
+        else:
+            lock = self._lock(build_key, timeout_seconds=0)
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(lock)
+            except TimeoutError:
+                return DEFERRED
+            # Another worker may have built it while we waited for the lock.
+            entry = self._current_entry(artifact, version)
+            if entry is not None:
+                self.touch(artifact, entry)
+                return CURRENT
+            fd, temp_path = tempfile.mkstemp(prefix="tmp_", suffix=os.path.splitext(artifact)[1], dir=directory)
+            os.close(fd)
+            try:
+                build(temp_path)
+                os.replace(temp_path, artifact)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self.record(artifact, version)
+        return BUILT
+
+    def record(self, artifact: str, version) -> None:
+        stamp = self._file_stamp(artifact)
+        if stamp is None:
+            return
+        now = time.time()
+
+        def mutate(entries):
+            entries[os.path.abspath(artifact)] = {
+                "version": self._key(version),
+                "stamp": stamp,
+                "built_at": now,
+                "last_used": now,
+            }
+
+        self._update(mutate)
+
+    def touch(self, artifact: str, entry: dict | None = None) -> None:
+        """Mark ``artifact`` as used now; ``entry`` is its manifest entry if already loaded.
+
+        Skips the locked manifest rewrite while the recorded use is recent enough.
+        """
+        if entry is None:
+            entry = self._load().get(os.path.abspath(artifact))
+        if not entry or time.time() - entry.get("last_used", 0) < TOUCH_INTERVAL_SECONDS:
+            return
+
+        def mutate(entries):
+            entry = entries.get(os.path.abspath(artifact))
+            if entry:
+                entry["last_used"] = time.time()
+
+        self._update(mutate)
+
+    def evict(self, directory: str, max_files: int, max_bytes: int, keep: tuple[str, ...] = ()) -> list[str]:
+        """Drop least recently used artifacts under ``directory`` until both limits hold.
+
+        Only files the cache built are considered; anything else in the folder is left alone.
+        """
+        directory = os.path.abspath(directory)
+        keep_paths = {os.path.abspath(path) for path in keep}
+        removed = []
+
+        def mutate(entries):
+            tracked = []
+            for path, entry in list(entries.items()):
+                if os.path.dirname(path) != directory:
+                    continue
+                if not os.path.exists(path):
+                    entries.pop(path)
+                    continue
+                tracked.append((entry.get("last_used", 0), path, os.path.getsize(path)))
+            tracked.sort()
+            total_files = len(tracked)
+            total_bytes = sum(size for _, _, size in tracked)
+            for _, path, size in tracked:
+                if total_files <= max_files and total_bytes <= max_bytes:
+                    break
+                if path in keep_paths:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                entries.pop(path, None)
+                removed.append(path)
+                total_files -= 1
+                total_bytes -= size
+
+        self._update(mutate)
+        return removed
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# Readings outside this window are treated as entry errors (g/dL).
+HB_PLAUSIBLE_RANGE = (3.0, 25.0)
+
+HB_DEVICE_COLUMNS = {
+    "horiba": ["HGB", "lab_hb_value"],
+    "poc": ["poc_hb_value"],
+    "masimo": ["masimo_reading"],
+}
+
+AGREEMENT_PAIRS = [
+    ("poc", "horiba"),
+    ("masimo", "horiba"),
+    ("masimo", "poc"),
+]
+
+GROUP_COLUMNS = {
+    "school": "school",
+    "age_years": "age_years",
+    "sex": "sex",
+    "location": "location",
+}
+
+# WHO haemoglobin thresholds (g/dL): (max age in months, anaemia cutoff, mild floor, moderate floor).
+# Below the moderate floor is severe anaemia.
+WHO_CUTOFFS = [
+    (59, 11.0, 10.0, 7.0),
+    (143, 11.5, 11.0, 8.0),
+    (179, 12.0, 11.0, 8.0),
+]
+
+
+def _numeric(df: pd.DataFrame, columns: list[str]) -> pd.Series:
+    result = pd.Series(np.nan, index=df.index, dtype="float64")
+    for column in columns:
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column].astype(str).str.strip(), errors="coerce")
+        result = result.fillna(values)
+    low, high = HB_PLAUSIBLE_RANGE
+    return result.where((result >= low) & (result <= high))
+
+
+def _first_text(df: pd.DataFrame, columns: list[str]) -> pd.Series:
+    result = pd.Series("", index=df.index, dtype="object")
+    for column in columns:
+        if column not in df.columns:
+            continue
+        values = df[column].fillna("").astype(str).str.strip()
+        result = result.where(result != "", values)
+    return result
+
+
+def _age_in_months(df: pd.DataFrame) -> pd.Series:
+    dob = pd.to_datetime(_first_text(df, ["dob"]), format="%Y-%m-%d", errors="coerce")
+    reference = pd.to_datetime(_first_text(df, ["study_date"]), format="%Y-%m-%d", errors="coerce")
+    submitted = pd.to_datetime(_first_text(df, ["submitted_at"]).str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    reference = reference.fillna(submitted)
+    months = (reference.dt.year - dob.dt.year) * 12 + (reference.dt.month - dob.dt.month)
+    months = months - (reference.dt.day < dob.dt.day).astype("float64")
+    return months.where(months >= 0)
+
+
+def build_frame(rows: list[dict[str, str]]) -> pd.DataFrame:
+    raw = pd.DataFrame(rows)
+    frame = pd.DataFrame(index=raw.index)
+    for device, columns in HB_DEVICE_COLUMNS.items():
+        frame[device] = _numeric(raw, columns)
+    frame["age_months"] = _age_in_months(raw)
+    completed = pd.to_numeric(_first_text(raw, ["age_completed"]), errors="coerce")
+    frame["age_years"] = (frame["age_months"] // 12).fillna(completed).astype("Int64")
+    frame["school"] = _first_text(raw, ["school", "school_anganwadi_name"]).str.upper()
+    frame["sex"] = _first_text(raw, ["sex", "gender"]).str.title()
+    frame["location"] = _first_text(raw, ["location_type", "location"]).str.title()
+    return frame
+
+
+def classify_anaemia(hb: pd.Series, age_months: pd.Series) -> pd.Series:
+    """Vectorized WHO grading: '', 'none', 'mild', 'moderate' or 'severe'."""
+    cutoff = pd.Series(np.nan, index=hb.index)
+    mild_floor = pd.Series(np.nan, index=hb.index)
+    moderate_floor = pd.Series(np.nan, index=hb.index)
+    remaining = age_months.notna()
+    for max_months, anaemia_cutoff, mild, moderate in WHO_CUTOFFS:
+        band = remaining & (age_months <= max_months)
+        cutoff[band] = anaemia_cutoff
+        mild_floor[band] = mild
+        moderate_floor[band] = moderate
+        remaining &= ~band
+
+    grade = np.select(
+        [
+            hb.isna() | cutoff.isna(),
+            hb >= cutoff,
+            hb >= mild_floor,
+            hb >= moderate_floor,
+        ],
+        ["", "none", "mild", "moderate"],
+        default="severe",
+    )
+    return pd.Series(grade, index=hb.index)
+
+
+def _clean(value):
+    if value is None:
+        return None
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else round(float(value), 3)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def prevalence_summary(frame: pd.DataFrame) -> dict:
+    summary = {}
+    for device in HB_DEVICE_COLUMNS:
+        grades = classify_anaemia(frame[device], frame["age_months"])
+        graded = grades[grades != ""]
+        counts = graded.value_counts()
+        total = int(len(graded))
+        anaemic = int(total - counts.get("none", 0))
+        summary[device] = {
+            "n": total,
+            "anaemic": anaemic,
+            "prevalence": _clean(anaemic / total) if total else None,
+            "mild": int(counts.get("mild", 0)),
+            "moderate": int(counts.get("moderate", 0)),
+            "severe": int(counts.get("severe", 0)),
+        }
+    return summary
+
+
+def group_summary(frame: pd.DataFrame, device: str = "horiba") -> dict:
+    result = {}
+    measured = frame[frame[device].notna()]
+    for name, column in GROUP_COLUMNS.items():
+        stats = measured.groupby(column, dropna=True)[device].agg(["count", "mean", "std"]).reset_index()
+        result[name] = [
+            {
+                "group": _clean(record[column]) if record[column] != "" else "Unknown",
+                "n": int(record["count"]),
+                "mean": _clean(record["mean"]),
+                "sd": _clean(record["std"]),
+            }
+            for record in stats.to_dict(orient="records")
+        ]
+    return result
+
+
+def agreement_summary(frame: pd.DataFrame) -> list[dict]:
+    """Bland-Altman bias and 95% limits of agreement for each device pair."""
+    results = []
+    for device, reference in AGREEMENT_PAIRS:
+        paired = frame[[device, reference]].dropna()
+        diff = (paired[device] - paired[reference]).to_numpy()
+        n = int(diff.size)
+        bias = float(diff.mean()) if n else np.nan
+        sd = float(diff.std(ddof=1)) if n > 1 else np.nan
+        results.append({
+            "pair": f"{device}_vs_{reference}",
+            "device": device,
+            "reference": reference,
+            "n": n,
+            "bias": _clean(bias),
+            "sd": _clean(sd),
+            "loa_lower": _clean(bias - 1.96 * sd),
+            "loa_upper": _clean(bias + 1.96 * sd),
+        })
+    return results
+
+
+def compute_hb_analytics(rows: list[dict[str, str]], group_device: str = "horiba") -> dict:
+    frame = build_frame(rows)
+    return {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "children": int(len(frame)),
+        "group_device": group_device,
+        "prevalence": prevalence_summary(frame),
+        "groups": group_summary(frame, device=group_device),
+        "agreement": agreement_summary(frame),
+    }
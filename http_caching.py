@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+
+NO_STORE = "no-store, no-cache, must-revalidate, max-age=0"
+# Fingerprinted URLs change whenever the file does, so the browser never has to ask again.
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE_PUBLIC = "public, no-cache"
+REVALIDATE_PRIVATE = "private, no-cache"
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class FileDigests:
+    """Content digests of files on disk, recomputed only when a file's stat changes."""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[tuple[int, int, int], str]] = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path: str) -> str | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        hasher = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        except OSError:
+            return None
+        digest = hasher.hexdigest()
+        with self._lock:
+            self._entries[path] = (stamp, digest)
+        return digest
+
+    def fingerprint(self, path: str, length: int = 12) -> str | None:
+        digest = self.digest(path)
+        return digest[:length] if digest else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def make_file_conditional(response, request, path: str, digests: FileDigests) -> bool:
+    """Give a file response a content-hash ETag and Last-Modified, then answer 304 if the client is current."""
+    digest = digests.digest(path)
+    if digest is None:
+        return False
+    response.set_etag(digest)
+    response.last_modified = datetime.fromtimestamp(int(os.path.getmtime(path)), tz=timezone.utc)
+    response.make_conditional(request)
+    return True
@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from werkzeug.security import generate_password_hash
+
+# The harness signs in through /investigator-login with its own account. It uses
+# the last credential slot so a real .env keeps working alongside it.
+LOAD_TEST_INVESTIGATOR = "loadtest"
+LOAD_TEST_PASSWORD = "loadtest-password"
+os.environ["INVESTIGATOR_USERNAME_50"] = LOAD_TEST_INVESTIGATOR
+os.environ["INVESTIGATOR_PASSWORD_HASH_50"] = generate_password_hash(LOAD_TEST_PASSWORD)
+
+import app as nin_app  # noqa: E402
+from change_feed import DELETE, MAX_PAGE_SIZE  # noqa: E402
+from perf_metrics import METRICS, percentile  # noqa: E402
+from response_schema import OVERFLOW_FIELD, dump_overflow, load_overflow  # noqa: E402
+from synthetic_data import SyntheticConfig, SyntheticDatasetWriter, ensure_dataset, parse_size  # noqa: E402
+
+
+JOURNEY_WEIGHTS = {
+    "investigator_form": 6,
+    "barcode_lookup": 2,
+    "admin_views": 1,
+    "horiba_upload": 1,
+}
+SAVE_PROGRESS_STEPS = 2
+HORIBA_BATCH_SIZE = 20
+# Stands in for a question dropped from the form after these responses were stored.
+RETIRED_QUESTION = "loadtest_retired_question"
+
+
+@dataclass
+class LoadTestStats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    error_samples: list[str] = field(default_factory=list)
+    lock_timeouts: int = 0
+    journeys: Counter = field(default_factory=Counter)
+    form_posts: int = 0
+    submitted_profiles: set[str] = field(default_factory=set)
+    progress_profiles: set[str] = field(default_factory=set)
+    horiba_values: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, step: str, elapsed: float, status: int | None) -> None:
+        with self.lock:
+            self.latencies[step].append(elapsed)
+            self.statuses[status if status is not None else "exception"] += 1
+
+    def record_error(self, step: str, exc: BaseException) -> None:
+        with self.lock:
+            if isinstance(exc, TimeoutError):
+                self.lock_timeouts += 1
+            self.errors[f"{step}: {type(exc).__name__}"] += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append("".join(traceback.format_exception_only(type(exc), exc)).strip())
+
+
+class StepFailed(Exception):
+    pass
+
+
+class VirtualUser:
+    """One simulated browser: its own test client and cookie jar, running journeys back to back."""
+
+    def __init__(self, user_id: int, stats: LoadTestStats, profile_ids: list[str], profiles: dict[str, dict], seed: int):
+        self.user_id = user_id
+        self.stats = stats
+        self.profile_ids = profile_ids
+        self.profiles = profiles
+        self.rng = random.Random(seed + user_id)
+        self.answers = SyntheticDatasetWriter(SyntheticConfig(children=0, seed=seed + user_id))
+        self.client = nin_app.app.test_client()
+
+    def step(self, name: str, method: str, path: str, expect: tuple[int, ...] = (200, 302), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.client.open(path, method=method, **kwargs)
+        except Exception as exc:
+            self.stats.record(name, time.perf_counter() - start, None)
+            self.stats.record_error(name, exc)
+            raise StepFailed(name) from exc
+        self.stats.record(name, time.perf_counter() - start, response.status_code)
+        body = response.get_data()
+        if b"Data is busy right now" in body:
+            self.stats.record_error(name, TimeoutError("Route reported a busy lock"))
+        if response.status_code not in expect:
+            self.stats.record_error(name, StepFailed(f"HTTP {response.status_code} on {path}"))
+            raise StepFailed(name)
+        return response
+
+    def barcode_login(self, profile_id: str) -> None:
+        self.step("barcode_login", "POST", "/login", data={"profile_id": profile_id})
+        self.step("profile_details", "GET", "/profile-details")
+
+    def investigator_login(self) -> None:
+        self.step(
+            "investigator_login",
+            "POST",
+            "/investigator-login",
+            data={"username": LOAD_TEST_INVESTIGATOR, "password": LOAD_TEST_PASSWORD},
+        )
+
+    def admin_login(self) -> None:
+        # /admin-login does not consult the configured admin credentials, so the
+        # harness signs the session directly instead of depending on a password.
+        with self.client.session_transaction() as session:
+            session["admin_logged_in"] = True
+            session["admin_username"] = "loadtest-admin"
+
+    def form_payload(self, profile_id: str, action: str) -> dict[str, str]:
+        answers = self.answers.response(self.profiles[profile_id])
+        for key in ["response_id", "profile_id", "submitted_at"]:
+            answers.pop(key, None)
+        answers["submit_action"] = action
+        return answers
+
+    def investigator_form(self) -> None:
+        profile_id = self.rng.choice(self.profile_ids)
+        self.barcode_login(profile_id)
+        self.investigator_login()
+        self.step("form_view", "GET", "/form")
+        for _ in range(SAVE_PROGRESS_STEPS):
+            self.step("form_save_progress", "POST", "/form", data=self.form_payload(profile_id, "save_progress"))
+            with self.stats.lock:
+                self.stats.form_posts += 1
+                self.stats.progress_profiles.add(profile_id)
+        self.step("form_submit", "POST", "/form", data=self.form_payload(profile_id, "submit_questionnaire"))
+        with self.stats.lock:
+            self.stats.form_posts += 1
+            self.stats.submitted_profiles.add(profile_id)
+        self.step("section_status", "GET", "/section-status")
+
+    def barcode_lookup(self) -> None:
+        self.barcode_login(self.rng.choice(self.profile_ids))
+        self.step("dashboard", "GET", "/dashboard")
+
+    def admin_views(self) -> None:
+        self.admin_login()
+        for name, path in [
+            ("admin_dashboard", "/admin-dashboard"),
+            ("admin_responses", "/admin/responses"),
+            ("admin_link_excel", "/admin/link-excel"),
+            ("admin_analytics", "/admin/analytics"),
+        ]:
+            self.step(name, "GET", path)
+
+    def horiba_upload(self) -> None:
+        self.admin_login()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["profile_id", "hgb", "rbc", "mcv"])
+        batch = self.rng.sample(self.profile_ids, min(HORIBA_BATCH_SIZE, len(self.profile_ids)))
+        uploaded = {}
+        for profile_id in batch:
+            value = f"{self.rng.uniform(8, 14):.1f}"
+            uploaded[profile_id] = value
+            writer.writerow([profile_id, value, f"{self.rng.uniform(3.8, 5.2):.2f}", str(self.rng.randint(65, 85))])
+        data = {"file": (io.BytesIO(buffer.getvalue().encode("utf-8")), f"horiba_load_{self.user_id}.csv")}
+        self.step("horiba_upload", "POST", "/horiba", data=data, content_type="multipart/form-data")
+        with self.stats.lock:
+            for profile_id, value in uploaded.items():
+                self.stats.horiba_values[profile_id].add(value)
+
+    def run(self, deadline: float, max_journeys: int | None) -> None:
+        names = list(JOURNEY_WEIGHTS)
+        weights = [JOURNEY_WEIGHTS[name] for name in names]
+        done = 0
+        while time.perf_counter() < deadline and (max_journeys is None or done < max_journeys):
+            journey = self.rng.choices(names, weights=weights)[0]
+            try:
+                getattr(self, journey)()
+                with self.stats.lock:
+                    self.stats.journeys[journey] += 1
+            except StepFailed:
+                with self.stats.lock:
+                    self.stats.journeys[f"{journey} (failed)"] += 1
+            done += 1
+
+
+def replay_feed(snapshot: dict[str, dict[str, dict]], since: int) -> tuple[dict[str, dict[str, dict]], int]:
+    state = {name: dict(rows) for name, rows in snapshot.items()}
+    count = 0
+    while True:
+        changes = nin_app.CHANGE_FEED.read(since, limit=MAX_PAGE_SIZE)
+        for change in changes:
+            if change.op == DELETE:
+                state[change.table].pop(change.key, None)
+            else:
+                state[change.table][change.key] = change.data
+        count += len(changes)
+        if not changes:
+            return state, count
+        since = changes[-1].seq
+
+
+def seed_retired_answers() -> dict[str, str]:
+    """Give every stored response an answer to a removed question, as a schema migration would."""
+    retired = {}
+    for path in nin_app.SITE_SHARDS.paths(nin_app.RESPONSE_CSV):
+        rows = nin_app.read_csv_as_dict_list(path)
+        for row in rows:
+            profile_id = (row.get("profile_id", "") or "").strip().upper()
+            if profile_id:
+                retired[profile_id] = f"kept-{profile_id}"
+                row[OVERFLOW_FIELD] = dump_overflow({**load_overflow(row.get(OVERFLOW_FIELD)), RETIRED_QUESTION: retired[profile_id]})
+        with nin_app.locked_file_access(path, mode="a+"):
+            nin_app.write_response_rows(path, rows)
+    return retired
+
+
+def check_integrity(data_dir: str, stats: LoadTestStats, feed_start=None, retired=None) -> list[tuple[str, bool, str]]:
+    checks = []
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        checks.append((name, bool(ok), detail))
+
+    headers = []
+    for responses_path in nin_app.SITE_SHARDS.paths(nin_app.RESPONSE_CSV):
+        with open(responses_path, "r", newline="", encoding="utf-8") as f:
+            headers.append(csv.DictReader(f).fieldnames or [])
+    check(
+        "responses.csv header matches the response storage layout",
+        bool(headers) and all(header == nin_app.RESPONSE_SCHEMA.storage_fields for header in headers),
+        f"{len(headers)} files",
+    )
+    responses = nin_app.read_csv_as_dict_list(nin_app.RESPONSE_CSV)
+    profile_counts = Counter((row.get("profile_id", "") or "").strip().upper() for row in responses)
+    duplicated = [pid for pid, count in profile_counts.items() if pid and count > 1]
+    check("one latest response per profile", not duplicated, ", ".join(duplicated[:10]))
+    response_ids = Counter(row.get("response_id", "") for row in responses)
+    check("response_id values are unique", all(count == 1 for count in response_ids.values()))
+    missing = sorted(stats.submitted_profiles - set(profile_counts))
+    check("every submitted profile has a response", not missing, ", ".join(missing[:10]))
+    if retired:
+        kept = {
+            (row.get("profile_id", "") or "").strip().upper(): load_overflow(row.get(OVERFLOW_FIELD)).get(RETIRED_QUESTION)
+            for row in responses
+        }
+        lost_answers = sorted(pid for pid, value in retired.items() if kept.get(pid) != value)
+        check(
+            "answers to removed questions survive form saves",
+            not lost_answers,
+            ", ".join(lost_answers[:10]) if lost_answers else f"{len(stats.submitted_profiles & retired.keys())} re-saved",
+        )
+
+    history_rows = nin_app.read_csv_as_dict_list(nin_app.RESPONSE_HISTORY_CSV)
+    check(
+        "history kept every form post (no lost appends)",
+        len(history_rows) == stats.form_posts,
+        f"{len(history_rows)} history rows for {stats.form_posts} posts",
+    )
+
+    audit_rows = nin_app.read_csv_as_dict_list(os.path.join(data_dir, "response_save_audit.csv"))
+    audit_ids = Counter((row.get("profile_id", "") or "").strip().upper() for row in audit_rows)
+    check("save-progress audit has one row per profile", all(count == 1 for count in audit_ids.values()))
+    missing_audit = sorted(stats.progress_profiles - set(audit_ids))
+    check("every saved profile is in the save-progress audit", not missing_audit, ", ".join(missing_audit[:10]))
+
+    linked_rows = nin_app.read_csv_as_dict_list(os.path.join(data_dir, "linked_data.csv"))
+    linked_map = {(row.get("profile_id", "") or "").strip().upper(): row for row in linked_rows}
+    check("linked_data.csv has unique profile ids", len(linked_map) == len(linked_rows))
+    lost_horiba = [
+        pid for pid, values in stats.horiba_values.items()
+        if (linked_map.get(pid, {}).get("horiba", "") or "") not in values
+    ]
+    check("every Horiba upload is reflected in linked data", not lost_horiba, ", ".join(lost_horiba[:10]))
+
+    if feed_start is not None:
+        replayed, count = replay_feed(*feed_start)
+        current = nin_app.change_feed_snapshot()
+        drifted = [f"{name}:{key}" for name in current for key in current[name].keys() | replayed[name].keys()
+                   if current[name].get(key) != replayed[name].get(key)]
+        check(
+            "change feed replays to the stored tables",
+            not drifted,
+            ", ".join(drifted[:10]) if drifted else f"{count} changes",
+        )
+
+    # The dashboard counters were seeded before the run and kept up from the feed since.
+    profiles = nin_app.normalize_profile_storage()
+    responses = nin_app.normalize_response_storage()
+    today = time.strftime("%Y-%m-%d")
+    responded = {(row.get("profile_id", "") or "").strip().upper() for row in responses} - {""}
+    measured = {pid for pid, row in linked_map.items() if (row.get("horiba", "") or "").strip()}
+    reloaded = {
+        "total_profiles": len(profiles),
+        "total_responses": len(responses),
+        "total_linked": len(nin_app.build_linked_view_data(write_back=False)[0]),
+        "today_submissions": sum(1 for row in responses if (row.get("submitted_at", "") or "").startswith(today)),
+        "save_progress_drafts": sum(1 for row in responses if nin_app.response_completion_state(row) != "complete"),
+        "horiba_pending": len(responded - measured),
+    }
+    counters = nin_app.DASHBOARD_COUNTERS.counts(today)
+    mismatched = [f"{name} {counters[name]} != {value}" for name, value in reloaded.items() if counters[name] != value]
+    check(
+        "dashboard counters match a full reload",
+        not mismatched,
+        ", ".join(mismatched) if mismatched else f"{counters['total_responses']} responses",
+    )
+
+    if nin_app.SQL_SYNC.configured:
+        expected = nin_app.SQL_SYNC.target_rows(nin_app.change_feed_snapshot())
+        stored = nin_app.SQL_SYNC.stored_rows()
+        drifted = [f"{name}:{key}" for name in expected for key in expected[name].keys() | stored[name].keys()
+                   if expected[name].get(key) != stored[name].get(key)]
+        check(
+            "SQL database matches the stored tables",
+            not drifted,
+            ", ".join(drifted[:10]) if drifted else ", ".join(f"{len(rows)} {name}" for name, rows in stored.items()),
+        )
+        # Both sides above are keyed by response_id; rows sharing an id would collapse on both.
+        check(
+            "SQL database has one response row per stored response",
+            len(stored["responses"]) == len(responses),
+            f"{len(stored['responses'])} SQL rows for {len(responses)} stored responses",
+        )
+
+    failed_jobs = nin_app.JOBS.store.list(limit=1000, state="failed")
+    check("no background job failed", not failed_jobs, "; ".join(f"{job.kind}: {job.error}" for job in failed_jobs[:5]))
+
+    leftovers = [
+        os.path.relpath(os.path.join(root, name), data_dir)
+        for root, _, names in os.walk(data_dir)
+        for name in names
+        if name.startswith("tmp_") and name.endswith(".csv")
+    ]
+    check("no temp files left behind", not leftovers, ", ".join(leftovers))
+    return checks
+
+
+def summarize(stats: LoadTestStats, elapsed: float, checks: list[tuple[str, bool, str]], users: int) -> dict:
+    steps = {}
+    for name, values in sorted(stats.latencies.items()):
+        ordered = sorted(values)
+        steps[name] = {
+            "count": len(ordered),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1),
+        }
+    lock_waits = {
+        item["labels"].get("file", ""): {
+            "count": item["count"],
+            "p95_ms": round(item["p95"] * 1000, 1) if item["p95"] is not None else None,
+            "total_ms": round(item["sum"] * 1000, 1),
+        }
+        for item in METRICS.snapshot()["histograms"]
+        if item["name"] == "nin_lock_wait_seconds"
+    }
+    total_requests = sum(len(values) for values in stats.latencies.values())
+    return {
+        "users": users,
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else None,
+        "journeys": dict(stats.journeys),
+        "statuses": {str(key): value for key, value in stats.statuses.items()},
+        "lock_timeouts": stats.lock_timeouts,
+        "errors": dict(stats.errors),
+        "error_samples": stats.error_samples,
+        "steps": steps,
+        "lock_waits": lock_waits,
+        "integrity": [{"check": name, "ok": ok, "detail": detail} for name, ok, detail in checks],
+    }
+
+
+def format_report(summary: dict) -> str:
+    lines = [
+        f"Users: {summary['users']}  Elapsed: {summary['elapsed_seconds']}s  "
+        f"Requests: {summary['requests']}  Throughput: {summary['throughput_rps']} req/s",
+        f"Journeys: {summary['journeys']}",
+        f"Statuses: {summary['statuses']}",
+        f"Lock timeouts: {summary['lock_timeouts']}",
+        "",
+        f"{'step':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for name, row in summary["steps"].items():
+        lines.append(f"{name:<22}{row['count']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    if summary["lock_waits"]:
+        lines.append("")
+        lines.append("Lock waits (p95 ms / total ms):")
+        for name, row in sorted(summary["lock_waits"].items()):
+            lines.append(f"  {name:<32}{row['p95_ms']:>10}{row['total_ms']:>12}")
+    if summary["errors"]:
+        lines.append("")
+        lines.append("Errors:")
+        for name, count in sorted(summary["errors"].items()):
+            lines.append(f"  {name}: {count}")
+        for sample in summary["error_samples"]:
+            lines.append(f"  e.g. {sample}")
+    lines.append("")
+    lines.append("Integrity:")
+    for item in summary["integrity"]:
+        mark = "PASS" if item["ok"] else "FAIL"
+        detail = f" ({item['detail']})" if item["detail"] else ""
+        lines.append(f"  [{mark}] {item['check']}{detail}")
+    return "\n".join(lines)
+
+
+def run_load_test(
+    data_dir: str,
+    users: int,
+    duration: float,
+    journeys_per_user: int | None,
+    seed: int,
+    site_shards: bool = False,
+    sql_url: str = "",
+) -> dict:
+    nin_app.SITE_SHARDS.enabled = site_shards
+    nin_app.configure_data_paths(data_dir)
+    nin_app.adopt_unsharded_files()
+    # Keep generated barcode images out of the real static folder.
+    nin_app.BARCODE_FOLDER = os.path.join(data_dir, "barcodes")
+    os.makedirs(nin_app.BARCODE_FOLDER, exist_ok=True)
+    METRICS.enabled = True
+    METRICS.reset()
+
+    profiles = {
+        (row.get("profile_id", "") or "").strip().upper(): row
+        for row in nin_app.read_csv_as_dict_list(nin_app.PROFILE_CSV)
+    }
+    profile_ids = sorted(pid for pid in profiles if pid)
+    if not profile_ids:
+        raise SystemExit("The load-test dataset has no profiles.")
+
+    # Seeded from the files as found, so the first write (which splits shared response ids) goes through the feed.
+    nin_app.DASHBOARD_COUNTERS.counts()
+    retired = seed_retired_answers()
+    if sql_url:
+        nin_app.SQL_SYNC.url = sql_url
+        nin_app.sql_backfill()
+    # Replaying the changes recorded during the run onto this snapshot must give the final tables.
+    feed_start = (nin_app.change_feed_snapshot(), nin_app.CHANGE_FEED.bounds()[1]) if nin_app.CHANGE_FEED.enabled else None
+    stats = LoadTestStats()
+    deadline = time.perf_counter() + duration
+    workers = [
+        threading.Thread(
+            target=VirtualUser(user_id, stats, profile_ids, profiles, seed).run,
+            args=(deadline, journeys_per_user),
+            name=f"virtual-user-{user_id}",
+        )
+        for user_id in range(users)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    # Uploads and workbook refreshes finish in background jobs; check the data once they are done.
+    nin_app.JOBS.wait_idle(timeout=120)
+    if nin_app.SQL_SYNC.configured:
+        nin_app.SQL_SYNC_WORKER.stop(timeout=60)
+        nin_app.SQL_SYNC.sync(wait=True)
+    return summarize(stats, elapsed, check_integrity(data_dir, stats, feed_start, retired), users)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Drive the app with concurrent investigator, admin and Horiba journeys against a temp data directory."
+    )
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users (threads).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run.")
+    parser.add_argument("--journeys", type=int, help="Stop each user after this many journeys instead of at the deadline.")
+    parser.add_argument("--children", type=parse_size, default=1_000, help="Synthetic dataset size when --source is not given.")
+    parser.add_argument("--source", help="Copy this data directory instead of generating synthetic data.")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--lock-timeout", type=float, help="Override LOCK_TIMEOUT_SECONDS to surface contention sooner.")
+    parser.add_argument("--site-shards", action="store_true", help="Split the dataset into per-site shards first (SITE_SHARDS=1).")
+    parser.add_argument("--sql-url", help="Also sync into this SQLAlchemy database (e.g. sqlite:///sync.db) and check it.")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp data directory for inspection.")
+    parser.add_argument("--json", dest="json_path", help="Also write the summary as JSON to this path.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.lock_timeout is not None:
+        nin_app.LOCK_TIMEOUT_SECONDS = args.lock_timeout
+
+    work_dir = tempfile.mkdtemp(prefix="nin_load_")
+    data_dir = os.path.join(work_dir, "data")
+    try:
+        if args.source:
+            shutil.copytree(args.source, data_dir, ignore=shutil.ignore_patterns(".*.lock", "tmp_*"))
+        else:
+            ensure_dataset(data_dir, SyntheticConfig(children=args.children, seed=args.seed))
+        summary = run_load_test(
+            data_dir,
+            max(1, args.users),
+            args.duration,
+            args.journeys,
+            args.seed,
+            site_shards=args.site_shards or nin_app.SITE_SHARDS.enabled,
+            sql_url=args.sql_url or "",
+        )
+    finally:
+        if args.keep:
+            print(f"Data directory kept at {data_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(format_report(summary))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if all(item["ok"] for item in summary["integrity"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTE_BUCKETS = (1_024, 16_384, 131_072, 1_048_576, 8_388_608, 67_108_864)
+SAMPLE_WINDOW = 2048
+
+METRIC_HELP = {
+    "nin_request_seconds": ("histogram", "Request latency by route."),
+    "nin_request_bytes_read": ("histogram", "Data file bytes read while handling one request."),
+    "nin_request_bytes_written": ("histogram", "Data file bytes written while handling one request."),
+    "nin_helper_seconds": ("histogram", "Time spent in storage, export and rendering helpers."),
+    "nin_lock_wait_seconds": ("histogram", "Time spent waiting for a data file lock."),
+    "nin_template_render_seconds": ("histogram", "Jinja template render time."),
+    "nin_lock_timeouts_total": ("counter", "Lock waits that hit the timeout."),
+    "nin_full_file_rewrites_total": ("counter", "Whole-file rewrites of data files."),
+    "nin_bytes_read_total": ("counter", "Data file bytes read."),
+    "nin_bytes_written_total": ("counter", "Data file bytes written."),
+    "nin_csv_cache_hits_total": ("counter", "CSV reads served from the worker cache."),
+    "nin_csv_cache_misses_total": ("counter", "CSV reads that had to parse the file."),
+    "nin_export_cache_hits_total": ("counter", "Export artifacts served without rebuilding."),
+    "nin_export_cache_misses_total": ("counter", "Export artifacts rebuilt because their sources changed."),
+    "nin_jobs_total": ("counter", "Background jobs finished, by kind and final state."),
+    "nin_change_feed_records_total": ("counter", "Rows appended to the change feed, by table."),
+    "nin_change_feed_errors_total": ("counter", "Writes whose changes could not be appended to the change feed."),
+    "nin_sql_sync_changes_total": ("counter", "Change feed entries applied to the SQL database."),
+    "nin_sql_sync_batch_seconds": ("histogram", "Time to apply one batch of changes to the SQL database."),
+    "nin_sql_sync_errors_total": ("counter", "SQL sync runs that failed after their retries."),
+}
+
+
+def _env_enabled(name: str) -> bool:
+    return (os.getenv(name) or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count", "samples")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.samples: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantiles(self) -> dict[str, float | None]:
+        ordered = sorted(self.samples)
+        return {
+            "p50": percentile(ordered, 0.50),
+            "p95": percentile(ordered, 0.95),
+            "p99": percentile(ordered, 0.99),
+        }
+
+
+class MetricsRegistry:
+    """In-process metrics. When disabled every hook is a single attribute check."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, tuple[tuple[str, str], ...]], Histogram] = {}
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self._request = threading.local()
+        self.started_at = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def observe(self, name: str, value: float, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str = "nin_helper_seconds") -> Callable:
+        """Decorator that records the wrapped function's duration labelled by its name."""
+        def decorator(func: Callable) -> Callable:
+            helper = func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, helper=helper)
+            return wrapper
+        return decorator
+
+    # ---- per-request accounting -------------------------------------------------
+    def start_request(self) -> None:
+        if not self.enabled:
+            return
+        self._request.started = time.perf_counter()
+        self._request.bytes_read = 0
+        self._request.bytes_written = 0
+
+    def add_bytes(self, kind: str, amount: int, file: str = "") -> None:
+        if not self.enabled:
+            return
+        self.inc(f"nin_bytes_{kind}_total", amount, file=file)
+        attribute = f"bytes_{kind}"
+        if hasattr(self._request, attribute):
+            setattr(self._request, attribute, getattr(self._request, attribute) + amount)
+
+    def finish_request(self, route: str, method: str, status: int) -> None:
+        if not self.enabled or not hasattr(self._request, "started"):
+            return
+        elapsed = time.perf_counter() - self._request.started
+        self.observe("nin_request_seconds", elapsed, route=route, method=method)
+        self.observe("nin_request_bytes_read", self._request.bytes_read, buckets=BYTE_BUCKETS, route=route)
+        self.observe("nin_request_bytes_written", self._request.bytes_written, buckets=BYTE_BUCKETS, route=route)
+        del self._request.started
+
+    # ---- reporting ---------------------------------------------------------------
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "mean": histogram.total / histogram.count if histogram.count else None,
+                    **histogram.quantiles(),
+                }
+                for (name, labels), histogram in self._histograms.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+        histograms.sort(key=lambda item: (item["name"], -item["sum"]))
+        counters.sort(key=lambda item: (item["name"], -item["value"]))
+        return {"enabled": self.enabled, "started_at": self.started_at, "histograms": histograms, "counters": counters}
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        announced: set[str] = set()
+
+        def announce(name: str, default_type: str) -> None:
+            if name in announced:
+                return
+            announced.add(name)
+            metric_type, help_text = METRIC_HELP.get(name, (default_type, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), histogram in histograms:
+            announce(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_number(bound)))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            announce(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_number(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+METRICS = MetricsRegistry(enabled=_env_enabled("PERF_METRICS_ENABLED"))
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_STACK_DEPTH = 128
+TOP_FUNCTION_LIMIT = 30
+CAPTURE_ID_CHARS = set("0123456789abcdef")
+
+
+@dataclass
+class CapturedProfile:
+    capture_id: str
+    created_at: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int
+    top_functions: list[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name="request-stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self) -> Counter[str]:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class RequestProfiler:
+    """cProfile for cumulative timings plus a stack sampler for flame graphs.
+
+    Only one cProfile can be active per interpreter on newer Pythons, so a
+    concurrent profiled request falls back to sampling alone.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.profile: cProfile.Profile | None = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.stacks: Counter[str] = Counter()
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self.sampler.start()
+        try:
+            self.profile.enable()
+        except ValueError:
+            self.profile = None
+
+    def stop(self) -> None:
+        if self.profile is not None:
+            self.profile.disable()
+        self.stacks = self.sampler.stop()
+        self.elapsed = time.perf_counter() - self.started
+
+    def top_functions(self, limit: int = TOP_FUNCTION_LIMIT) -> list[dict]:
+        if self.profile is None:
+            return []
+        stats = pstats.Stats(self.profile).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": total_calls,
+                "primitive_calls": primitive_calls,
+                "total_ms": round(total_time * 1000, 3),
+                "cumulative_ms": round(cumulative_time * 1000, 3),
+            }
+            for (filename, line, name), (primitive_calls, total_calls, total_time, cumulative_time, _) in ranked
+        ]
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def capture_paths(directory: str, capture_id: str) -> dict[str, str]:
+    return {
+        "meta": os.path.join(directory, f"{capture_id}.json"),
+        "pstats": os.path.join(directory, f"{capture_id}.prof"),
+        "collapsed": os.path.join(directory, f"{capture_id}.collapsed"),
+    }
+
+
+def is_capture_id(value: str) -> bool:
+    return len(value) == 32 and set(value) <= CAPTURE_ID_CHARS
+
+
+def save_capture(directory: str, profiler: RequestProfiler, method: str, path: str, status: int) -> CapturedProfile:
+    os.makedirs(directory, exist_ok=True)
+    capture = CapturedProfile(
+        capture_id=uuid.uuid4().hex,
+        created_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        method=method,
+        path=path,
+        status=status,
+        duration_ms=round(profiler.elapsed * 1000, 1),
+        samples=sum(profiler.stacks.values()),
+        top_functions=profiler.top_functions(),
+    )
+    paths = capture_paths(directory, capture.capture_id)
+    if profiler.profile is not None:
+        profiler.profile.dump_stats(paths["pstats"])
+    with open(paths["collapsed"], "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    with open(paths["meta"], "w", encoding="utf-8") as f:
+        json.dump(capture.to_dict(), f, indent=2)
+    return capture
+
+
+def list_captures(directory: str) -> list[CapturedProfile]:
+    if not os.path.isdir(directory):
+        return []
+    captures = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                captures.append(CapturedProfile(**json.load(f)))
+        except (OSError, ValueError, TypeError):
+            continue
+    captures.sort(key=lambda capture: capture.created_at, reverse=True)
+    return captures
+
+
+def delete_capture(directory: str, capture_id: str) -> None:
+    for path in capture_paths(directory, capture_id).values():
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def prune_captures(directory: str, keep: int) -> int:
+    removed = 0
+    for capture in list_captures(directory)[keep:]:
+        delete_capture(directory, capture.capture_id)
+        removed += 1
+    return removed
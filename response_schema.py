@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import AbstractContextManager
+from typing import Callable, Iterable, Mapping
+
+from sparse_records import RecordView, SparseRecord
+
+
+SCHEMA_VERSION_FIELD = "schema_version"
+OVERFLOW_FIELD = "schema_overflow"
+BOOKKEEPING_FIELDS = (SCHEMA_VERSION_FIELD, OVERFLOW_FIELD)
+# Key used when a stored overflow cell is not valid JSON, so its text is still kept.
+UNPARSED_OVERFLOW_KEY = "_unparsed"
+
+
+def schema_version(fields: Iterable[str]) -> str:
+    """Short content hash of an ordered field list; the same form always gets the same version."""
+    names = [str(name) for name in fields if name not in BOOKKEEPING_FIELDS]
+    return hashlib.blake2b("\n".join(names).encode("utf-8"), digest_size=6).hexdigest()
+
+
+def load_overflow(text) -> dict[str, str]:
+    text = (text or "").strip()
+    if not text:
+        return {}
+    try:
+        loaded = json.loads(text)
+    except ValueError:
+        return {UNPARSED_OVERFLOW_KEY: text}
+    if not isinstance(loaded, dict):
+        return {UNPARSED_OVERFLOW_KEY: text}
+    return {str(key): "" if value is None else str(value) for key, value in loaded.items()}
+
+
+def dump_overflow(values: Mapping[str, str]) -> str:
+    # Sorted and compact, so an unchanged map serializes to the same cell and the
+    # "file already holds these rows" check in the writer still matches.
+    return json.dumps(dict(values), sort_keys=True, ensure_ascii=False, separators=(",", ":")) if values else ""
+
+
+class ResponseSchema:
+    """Projects response rows written under any form version onto the current one.
+
+    Stored rows carry the version of the form they were answered with and an
+    overflow map holding answers to questions the current form no longer has.
+    Rows from files written before versioning (no bookkeeping columns) take the
+    version of their file header. Nothing is rewritten on read: rows move to the
+    current layout the next time their file is written anyway.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = [str(name) for name in fields]
+        self.version = schema_version(self.fields)
+        self.storage_fields = self.fields + list(BOOKKEEPING_FIELDS)
+        self._field_set = frozenset(self.fields)
+        self._storage_keys = frozenset(self.storage_fields)
+        self._header_versions: dict[tuple[str, ...], str] = {}
+        self._header_lock = threading.Lock()
+
+    def header_version(self, header: Iterable[str]) -> str:
+        key = tuple(header)
+        version = self._header_versions.get(key)
+        if version is None:
+            version = schema_version(key)
+            with self._header_lock:
+                self._header_versions[key] = version
+        return version
+
+    def in_storage_layout(self, row: Mapping) -> bool:
+        if isinstance(row, RecordView) and not row.changed:
+            row = row.record
+        if isinstance(row, SparseRecord):
+            # Compare the shared header once instead of walking every key of the row.
+            keys_match = len(row) == len(row.schema) and row.schema.index.keys() == self._storage_keys
+        else:
+            keys_match = row.keys() == self._storage_keys
+        return keys_match and bool(row.get(SCHEMA_VERSION_FIELD))
+
+    def project(self, row: Mapping, keep_unknown: bool = True) -> dict[str, str]:
+        """A new row with every current field plus the bookkeeping columns.
+
+        ``keep_unknown=False`` is for answers posted by the current form: they are
+        stamped with the current version and keys outside it (CSRF token, buttons)
+        are dropped instead of overflowing.
+        """
+        if keep_unknown and isinstance(row, (SparseRecord, RecordView)) and self.in_storage_layout(row):
+            # Already in the current layout: share the stored values instead of copying every field.
+            return RecordView(row)
+        clean = {key: row.get(key, "") for key in self.fields}
+        if not keep_unknown:
+            clean[SCHEMA_VERSION_FIELD] = self.version
+            clean[OVERFLOW_FIELD] = ""
+            return clean
+        if self.in_storage_layout(row):
+            clean[SCHEMA_VERSION_FIELD] = row[SCHEMA_VERSION_FIELD]
+            clean[OVERFLOW_FIELD] = row.get(OVERFLOW_FIELD) or ""
+            return clean
+
+        overflow = load_overflow(row.get(OVERFLOW_FIELD))
+        for key, value in row.items():
+            if key is None or key in self._field_set or key in BOOKKEEPING_FIELDS:
+                continue
+            if value not in ("", None):
+                overflow[str(key)] = str(value)
+        # A question that was removed and later added back picks its old answer up again.
+        for key in [key for key in overflow if key in self._field_set]:
+            value = overflow.pop(key)
+            if not clean[key]:
+                clean[key] = value
+        clean[SCHEMA_VERSION_FIELD] = row.get(SCHEMA_VERSION_FIELD) or self.header_version(
+            key for key in row.keys() if key is not None
+        )
+        clean[OVERFLOW_FIELD] = dump_overflow(overflow)
+        return clean
+
+    def carry_overflow(self, previous: Mapping, row: dict) -> dict:
+        """Keep ``previous``'s answers to removed questions on ``row``, which replaces it.
+
+        A form post only has the current questions, so its overflow starts empty;
+        without this, saving a response once would drop what migration kept.
+        """
+        kept = load_overflow(self.project(previous)[OVERFLOW_FIELD])
+        if kept:
+            kept.update(load_overflow(row.get(OVERFLOW_FIELD)))
+            row[OVERFLOW_FIELD] = dump_overflow(kept)
+        return row
+
+    def for_storage(self, rows: Iterable[Mapping]) -> list[Mapping]:
+        return [row if self.in_storage_layout(row) else self.project(row) for row in rows]
+
+    def lazily_projected(self, stored_rows: list[Mapping], projected_rows: list[Mapping]) -> bool:
+        """True when ``projected_rows`` differ from a pre-versioning file only by projection.
+
+        That is a form change and nothing else, so the file does not need rewriting yet.
+        """
+        if len(stored_rows) != len(projected_rows):
+            return False
+        if stored_rows and self.in_storage_layout(stored_rows[0]):
+            return False
+        fields = self.fields
+        return all(
+            stored.get(key, "") == projected[key]
+            for stored, projected in zip(stored_rows, projected_rows)
+            for key in fields
+        )
+
+
+class SchemaRegistry:
+    """Field lists of every response schema version seen, kept in a JSON file next to the data.
+
+    Versions are content hashes, so workers agree on them without coordination; the
+    registry only lets tools map an old version back to the questions it had.
+    """
+
+    def __init__(self, path: str, lock: Callable[[str], AbstractContextManager] | None = None):
+        self.path = path
+        self._lock = lock
+        self._known: set[str] = set()
+
+    def relocate(self, path: str) -> None:
+        self.path = path
+        self._known = set()
+
+    def load(self) -> dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return loaded if isinstance(loaded, dict) else {}
+
+    def register(self, fields: Iterable[str]) -> str:
+        fields = [str(name) for name in fields if name not in BOOKKEEPING_FIELDS]
+        version = schema_version(fields)
+        if version in self._known:
+            return version
+        if self._lock is None:
+            self._register(version, fields)
+        else:
+            with self._lock(self.path):
+                self._register(version, fields)
+        self._known.add(version)
+        return version
+
+    def _register(self, version: str, fields: list[str]) -> None:
+        entries = self.load()
+        if version in entries:
+            return
+        entries[version] = {"fields": fields, "first_seen": time.strftime("%Y-%m-%d %H:%M:%S")}
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix="tmp_schemas_", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Show which form schema versions the stored responses were written with.")
+    parser.add_argument("--data-dir", help="Read data from here instead of the app's DATA_DIR.")
+    parser.add_argument("--file", default="responses.csv", help="Response file inside the data directory.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    import app as nin_app
+
+    if args.data_dir:
+        nin_app.configure_data_paths(args.data_dir)
+    schema = nin_app.RESPONSE_SCHEMA
+    known = nin_app.RESPONSE_SCHEMAS.load()
+    path = os.path.join(nin_app.DATA_DIR, args.file)
+    if not os.path.exists(path):
+        print(f"{path} does not exist", file=sys.stderr)
+        return 1
+
+    versions: Counter[str] = Counter()
+    overflowing: Counter[str] = Counter()
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header = [name.strip() for name in reader.fieldnames or []]
+        for row in reader:
+            row = {(key.strip() if key is not None else None): value for key, value in row.items()}
+            projected = schema.project(row)
+            versions[projected[SCHEMA_VERSION_FIELD]] += 1
+            overflowing.update(load_overflow(projected[OVERFLOW_FIELD]).keys())
+
+    layout = "current" if header == schema.storage_fields else f"version {schema.header_version(header)} (rewritten on next write)"
+    print(f"current schema {schema.version}: {len(schema.fields)} fields; file layout: {layout}")
+    for version, count in versions.most_common():
+        fields = (known.get(version) or {}).get("fields")
+        if version == schema.version:
+            note = "current"
+        elif fields is None:
+            note = "not in registry"
+        else:
+            added = len(set(schema.fields) - set(fields))
+            removed = len(set(fields) - set(schema.fields))
+            note = f"+{added} / -{removed} fields vs current"
+        print(f"  {version}  {count:>7} rows  {note}")
+    for key, count in overflowing.most_common():
+        print(f"  overflow {key}: {count} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterator
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+SWEEP_INTERVAL_SECONDS = 300
+# Unmodified sessions only push their expiry forward this often, so plain page
+# views do not turn into a database write each.
+TOUCH_INTERVAL_SECONDS = 300
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str | None = None, expires_at: float | None = None, new: bool = False):
+        def on_update(session):
+            session.modified = True
+            session.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.regenerated = False
+
+    def regenerate(self) -> None:
+        """Move the data to a new id when the response is saved; the old id stops working."""
+        self.regenerated = True
+        self.modified = True
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class SqliteSessionInterface(SessionInterface):
+    """Keeps session data in SQLite; the cookie only carries a signed, opaque session id.
+
+    Works across worker processes (WAL mode, one short-lived connection per
+    call). Expired rows are swept at most every ``SWEEP_INTERVAL_SECONDS``.
+    """
+
+    serializer = TaggedJSONSerializer()
+    salt = "server-session"
+
+    def __init__(self, path: str, lifetime: timedelta | None = None):
+        self.path = path
+        self.lifetime = lifetime
+        self._last_sweep = 0.0
+        self._initialized_path: str | None = None
+        self._init_lock = threading.Lock()
+
+    def relocate(self, path: str) -> None:
+        self.path = path
+        self._initialized_path = None
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized_path == self.path:
+                return
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " sid TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+            connection.commit()
+            self._initialized_path = self.path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            self._ensure_schema(connection)
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _signer(self, app) -> Signer | None:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _lifetime_seconds(self, app) -> float:
+        return (self.lifetime or app.permanent_session_lifetime).total_seconds()
+
+    def open_session(self, app, request):
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSideSession(new=True)
+        try:
+            sid = signer.unsign(cookie).decode("ascii")
+        except (BadSignature, UnicodeDecodeError):
+            return ServerSideSession(new=True)
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?",
+                (sid, time.time()),
+            ).fetchone()
+        if row is None:
+            return ServerSideSession(new=True)
+        try:
+            data = self.serializer.loads(row[0])
+        except ValueError:
+            return ServerSideSession(new=True)
+        return ServerSideSession(data, sid=sid, expires_at=row[1])
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # After a login or logout the id the browser had must not keep working (session fixation).
+        stale_sid = session.sid if session.regenerated else None
+        if stale_sid:
+            session.sid = None
+
+        if not session:
+            old_sid = stale_sid or session.sid
+            if old_sid and session.modified:
+                with self._connect() as connection:
+                    connection.execute("DELETE FROM sessions WHERE sid = ?", (old_sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = self._lifetime_seconds(app)
+        needs_touch = session.expires_at is None or session.expires_at - now < lifetime - TOUCH_INTERVAL_SECONDS
+        if not (session.modified or needs_touch):
+            return
+
+        if not session.sid:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = now + lifetime
+        with self._connect() as connection:
+            if stale_sid:
+                connection.execute("DELETE FROM sessions WHERE sid = ?", (stale_sid,))
+            if session.modified:
+                connection.execute(
+                    "INSERT INTO sessions (sid, data, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                    (session.sid, self.serializer.dumps(dict(session)), session.expires_at),
+                )
+            else:
+                connection.execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (session.expires_at, session.sid))
+        self.sweep(now)
+
+        if session.modified or session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode("ascii"),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+        response.vary.add("Cookie")
+
+    def sweep(self, now: float | None = None, force: bool = False) -> int:
+        now = now or time.time()
+        if not force and now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return 0
+        self._last_sweep = now
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import os
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Mapping
+
+
+SITES_DIRNAME = "sites"
+# Rows whose profile id does not follow the generated format (legacy or hand-typed ids, blanks).
+UNSITED = "_unsited"
+# A combined file that was split into shards is kept under this suffix.
+UNSHARDED_SUFFIX = ".unsharded"
+# generate_profile_id: name, surname, DDMMYY, gender, school two-letter code, location
+# initial, then an optional numeric suffix from generate_unique_profile_id.
+SITE_CODE_PATTERN = re.compile(r"^[A-Z]{2}\d{6}[A-Z](?P<site>[A-Z]{3})\d{0,3}$")
+
+
+def site_code(profile_id) -> str:
+    """School code plus location initial encoded in a profile id, e.g. ``VVS``."""
+    normalized = re.sub(r"[^A-Za-z0-9]", "", str(profile_id or "")).upper()
+    match = SITE_CODE_PATTERN.match(normalized)
+    return match.group("site") if match else UNSITED
+
+
+def timestamp_order(field: str):
+    # Stored timestamps are "%Y-%m-%d %H:%M:%S", so text order is time order; undated rows go last.
+    def key(row: Mapping) -> tuple[bool, str]:
+        value = (row.get(field, "") or "").strip()
+        return (not value, value)
+
+    return key
+
+
+@dataclass(frozen=True)
+class ShardedTable:
+    name: str
+    order_field: str
+    key_field: str = "profile_id"
+
+
+class SiteShards:
+    """Splits the per-child tables into one file per site under ``<data_dir>/sites/<site>/``.
+
+    Callers keep using the logical path (``DATA_DIR/profiles.csv``). ``site_path`` routes a
+    single profile's reads and writes to its shard, ``paths`` lists every shard for
+    whole-table work, ``partition`` groups rows for writing back, and ``merge`` interleaves
+    shard iterators in timestamp order. Tables that are not registered, or every table
+    while ``enabled`` is false, resolve to the logical path itself.
+    """
+
+    def __init__(self, data_dir: str, tables: Iterable[ShardedTable], enabled: bool = False):
+        self.data_dir = os.path.abspath(data_dir)
+        self.tables = {table.name: table for table in tables}
+        self.enabled = enabled
+
+    def relocate(self, data_dir: str) -> None:
+        self.data_dir = os.path.abspath(data_dir)
+
+    @property
+    def root(self) -> str:
+        return os.path.join(self.data_dir, SITES_DIRNAME)
+
+    def table_for(self, path: str) -> ShardedTable | None:
+        if not self.enabled:
+            return None
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.data_dir:
+            return None
+        return self.tables.get(os.path.basename(path))
+
+    def sites(self) -> list[str]:
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        return sorted(name for name in names if os.path.isdir(os.path.join(self.root, name)))
+
+    def site_path(self, path: str, profile_id) -> str:
+        table = self.table_for(path)
+        if table is None:
+            return path
+        return os.path.join(self.root, site_code(profile_id), table.name)
+
+    def paths(self, path: str) -> list[str]:
+        """Every existing shard of the table at ``path`` (just ``[path]`` when it is not sharded)."""
+        table = self.table_for(path)
+        if table is None:
+            return [path]
+        candidates = (os.path.join(self.root, site, table.name) for site in self.sites())
+        return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+    def exists(self, path: str) -> bool:
+        return any(os.path.exists(candidate) for candidate in self.paths(path))
+
+    def partition(self, path: str, rows: Iterable[Mapping]) -> dict[str, list]:
+        """Rows grouped by shard path. Existing shards are always present, so emptied ones get rewritten."""
+        table = self.table_for(path)
+        if table is None:
+            return {path: list(rows)}
+        grouped: dict[str, list] = {shard: [] for shard in self.paths(path)}
+        for row in rows:
+            grouped.setdefault(self.site_path(path, row.get(table.key_field, "")), []).append(row)
+        return grouped
+
+    def merge(self, path: str, shards: Iterable[Iterable[Mapping]]) -> Iterator[Mapping]:
+        """One iterator over every shard's rows, ordered by the table's timestamp.
+
+        Each shard is consumed lazily; rows of one shard keep their relative order.
+        """
+        table = self.table_for(path)
+        shards = list(shards)
+        if table is None or len(shards) == 1:
+            for rows in shards:
+                yield from rows
+            return
+        yield from heapq.merge(*shards, key=timestamp_order(table.order_field))
+
+    def unsharded_paths(self) -> list[str]:
+        """Combined files sitting at a logical path while sharding is on; they need splitting."""
+        if not self.enabled:
+            return []
+        return [
+            os.path.join(self.data_dir, name)
+            for name in self.tables
+            if os.path.exists(os.path.join(self.data_dir, name))
+        ]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Inspect, split or join the per-site shards of profiles and responses.")
+    parser.add_argument("command", choices=["status", "split", "join"])
+    parser.add_argument("--data-dir", help="Use this data directory instead of the app's DATA_DIR.")
+    return parser
+
+
+def _read_header(path: str) -> list[str]:
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return [name.strip() for name in next(csv.reader(f), [])]
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+
+    import app as nin_app
+
+    shards = nin_app.SITE_SHARDS
+    # The command decides here; SITE_SHARDS in the environment only matters to the app.
+    shards.enabled = True
+    if args.data_dir:
+        nin_app.configure_data_paths(args.data_dir)
+
+    if args.command == "split":
+        for path in nin_app.adopt_unsharded_files():
+            print(f"{os.path.basename(path)} split into {SITES_DIRNAME}/; original kept as {path}{UNSHARDED_SUFFIX}")
+    elif args.command == "join":
+        nin_app.adopt_unsharded_files()
+        joined = {}
+        for name in shards.tables:
+            path = os.path.join(shards.data_dir, name)
+            header: list[str] = []
+            for shard in shards.paths(path):
+                header.extend(field for field in _read_header(shard) if field not in header)
+            if header:
+                joined[path] = (header, nin_app.read_csv_as_dict_list(path))
+        shards.enabled = False
+        for path, (header, rows) in joined.items():
+            with nin_app.locked_file_access(path, mode="a+"), nin_app.recording_changes(record=False):
+                nin_app.write_dict_list_to_csv(path, rows, header)
+            print(f"{os.path.basename(path)}: {len(rows)} rows joined")
+        if os.path.isdir(shards.root):
+            backup = f"{shards.root}.joined-{time.strftime('%Y%m%d%H%M%S')}"
+            os.replace(shards.root, backup)
+            print(f"shards moved to {backup}; run with SITE_SHARDS off from now on")
+        return 0
+
+    for path in shards.unsharded_paths():
+        print(f"{os.path.basename(path)} is not split yet (run: python site_shards.py split)")
+    counts: dict[str, Counter[str]] = {}
+    for name in shards.tables:
+        for path in shards.paths(os.path.join(shards.data_dir, name)):
+            site = os.path.basename(os.path.dirname(path))
+            counts.setdefault(site, Counter())[name] = len(nin_app.read_csv_as_dict_list(path))
+    names = list(shards.tables)
+    print(f"{'site':<10}" + "".join(f"{name:>24}" for name in names))
+    for site in sorted(counts):
+        print(f"{site:<10}" + "".join(f"{counts[site][name]:>24}" for name in names))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
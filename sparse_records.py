@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from collections.abc import Mapping, MutableMapping
+from typing import Iterable, Iterator
+
+# Short values repeat across rows ("Yes", "Urban", dates); sharing one copy of each
+# is a large part of the saving on wide questionnaire rows.
+INTERN_MAX_LENGTH = 64
+# Top-level keys of the sparse JSON layout, mirroring the `responses` table in nin_project.sql.
+SPARSE_KEY_FIELDS = ("response_id", "profile_id", "submitted_at")
+# Marks a field deleted from a RecordView while its record still has it.
+_DELETED = object()
+
+
+def _intern(value: str) -> str:
+    return sys.intern(value) if len(value) <= INTERN_MAX_LENGTH else value
+
+
+class RecordSchema:
+    """Ordered, interned field names shared by every record read with the same header."""
+
+    __slots__ = ("fields", "index")
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = tuple(sys.intern(str(name)) for name in fields)
+        self.index = {name: position for position, name in enumerate(self.fields)}
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RecordSchema) and self.fields == other.fields
+
+    def __hash__(self) -> int:
+        return hash(self.fields)
+
+    def pack(self, row: Mapping) -> "SparseRecord":
+        if isinstance(row, RecordView):
+            if not row.changed:
+                row = row.record
+            elif row.record.schema is self and all(key in self.index for key in row._changes):
+                # Only the changed fields can differ from the record; skip walking the rest.
+                row = row.nonempty()
+        if isinstance(row, SparseRecord) and row.schema is self:
+            return row
+        positions = array("H")
+        values = []
+        extra = None
+        for key, value in row.items():
+            if key is None:
+                continue
+            value = "" if value is None else str(value)
+            position = self.index.get(key)
+            if position is None:
+                extra = extra or {}
+                extra[sys.intern(str(key))] = value
+            elif value:
+                positions.append(position)
+                values.append(_intern(value))
+        if positions and any(a > b for a, b in zip(positions, positions[1:])):
+            ordered = sorted(zip(positions, values))
+            positions = array("H", (position for position, _ in ordered))
+            values = [value for _, value in ordered]
+        return SparseRecord(self, positions, tuple(values), extra)
+
+
+_SCHEMAS: dict[tuple[str, ...], RecordSchema] = {}
+
+
+def schema_for(fields: Iterable[str]) -> RecordSchema:
+    """One shared schema object per distinct field list (responses and history share one)."""
+    key = tuple(str(name) for name in fields)
+    schema = _SCHEMAS.get(key)
+    if schema is None:
+        schema = _SCHEMAS.setdefault(key, RecordSchema(key))
+    return schema
+
+
+class SparseRecord(Mapping):
+    """Read-only row that stores only its non-empty values.
+
+    It reads like the dense dict ``csv.DictReader`` would produce: every schema
+    field is a key and empty ones read as "". Wrap it in a ``RecordView`` to edit it
+    without copying, or use ``to_dict()`` for a dense mutable copy.
+    """
+
+    __slots__ = ("schema", "_positions", "_values", "_extra")
+
+    def __init__(self, schema: RecordSchema, positions: array, values: tuple, extra: dict | None = None):
+        self.schema = schema
+        self._positions = positions
+        self._values = values
+        self._extra = extra
+
+    def __getitem__(self, key):
+        position = self.schema.index.get(key)
+        if position is None:
+            if self._extra is not None and key in self._extra:
+                return self._extra[key]
+            raise KeyError(key)
+        slot = bisect_left(self._positions, position)
+        if slot < len(self._positions) and self._positions[slot] == position:
+            return self._values[slot]
+        return ""
+
+    def get(self, key, default=None):
+        # Mapping.get would go through __getitem__ and KeyError; rows are read field by field a lot.
+        position = self.schema.index.get(key)
+        if position is None:
+            return self._extra.get(key, default) if self._extra else default
+        slot = bisect_left(self._positions, position)
+        if slot < len(self._positions) and self._positions[slot] == position:
+            return self._values[slot]
+        return ""
+
+    def __iter__(self) -> Iterator[str]:
+        if not self._extra:
+            return iter(self.schema.fields)
+        return chain(self.schema.fields, self._extra)
+
+    def __len__(self) -> int:
+        return len(self.schema.fields) + (len(self._extra) if self._extra else 0)
+
+    def __contains__(self, key) -> bool:
+        return key in self.schema.index or (self._extra is not None and key in self._extra)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, SparseRecord) and other.schema == self.schema:
+            return (
+                self._positions == other._positions
+                and self._values == other._values
+                and (self._extra or {}) == (other._extra or {})
+            )
+        if not isinstance(other, Mapping) or len(other) != len(self):
+            return False if isinstance(other, Mapping) else NotImplemented
+        try:
+            return all(other[key] == value for key, value in self.items())
+        except KeyError:
+            return False
+
+    __hash__ = None
+
+    def nonempty(self) -> dict[str, str]:
+        data = {self.schema.fields[position]: value for position, value in zip(self._positions, self._values)}
+        if self._extra:
+            data.update((key, value) for key, value in self._extra.items() if value)
+        return data
+
+    def to_dict(self) -> dict[str, str]:
+        data = dict.fromkeys(self.schema.fields, "")
+        for position, value in zip(self._positions, self._values):
+            data[self.schema.fields[position]] = value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"SparseRecord({self.nonempty()!r})"
+
+
+class RecordView(MutableMapping):
+    """Mutable row over a shared SparseRecord that copies only what is changed on it.
+
+    Reads fall through to the record; setting or deleting a field stores just that
+    field, and setting a field back to its stored value stores nothing. Many views can
+    share one cached record, so handing a view to code that edits rows costs a few
+    dozen bytes instead of a dense dict. ``to_dict()`` expands it where a real dict is
+    needed (``jsonify``, pandas).
+    """
+
+    __slots__ = ("record", "_changes")
+
+    def __init__(self, record: "SparseRecord | RecordView"):
+        if isinstance(record, RecordView):
+            self.record = record.record
+            self._changes = dict(record._changes) if record._changes else None
+        else:
+            self.record = record
+            self._changes = None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._changes)
+
+    def __getitem__(self, key):
+        changes = self._changes
+        if changes is not None and key in changes:
+            value = changes[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        return self.record[key]
+
+    def get(self, key, default=None):
+        changes = self._changes
+        if changes is not None and key in changes:
+            value = changes[key]
+            return default if value is _DELETED else value
+        return self.record.get(key, default)
+
+    def __setitem__(self, key, value) -> None:
+        if self.record.get(key, _DELETED) == value:
+            if self._changes:
+                self._changes.pop(key, None)
+            return
+        if self._changes is None:
+            self._changes = {}
+        self._changes[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key in self.record:
+            if self._changes is None:
+                self._changes = {}
+            self._changes[key] = _DELETED
+        else:
+            del self._changes[key]
+
+    def __iter__(self) -> Iterator[str]:
+        changes = self._changes
+        record = self.record
+        if not changes or all(key in record and value is not _DELETED for key, value in changes.items()):
+            return iter(record)
+        return chain(
+            (key for key in record if changes.get(key) is not _DELETED),
+            (key for key in changes if key not in record),
+        )
+
+    def __len__(self) -> int:
+        changes = self._changes
+        if not changes:
+            return len(self.record)
+        record = self.record
+        return len(record) + sum(
+            -1 if value is _DELETED else 0 if key in record else 1 for key, value in changes.items()
+        )
+
+    def __contains__(self, key) -> bool:
+        changes = self._changes
+        if changes is not None and key in changes:
+            return changes[key] is not _DELETED
+        return key in self.record
+
+    def __eq__(self, other) -> bool:
+        if not self._changes:
+            if other is self.record:
+                return True
+            if isinstance(other, RecordView) and other.record is self.record and not other._changes:
+                return True
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def copy(self) -> "RecordView":
+        return RecordView(self)
+
+    def nonempty(self) -> dict[str, str]:
+        data = self.record.nonempty()
+        for key, value in (self._changes or {}).items():
+            if value is _DELETED or value in ("", None):
+                data.pop(key, None)
+            else:
+                data[key] = str(value)
+        return data
+
+    def to_dict(self) -> dict:
+        data = self.record.to_dict()
+        for key, value in (self._changes or {}).items():
+            if value is _DELETED:
+                del data[key]
+            else:
+                data[key] = value
+        return data
+
+    def __repr__(self) -> str:
+        return f"RecordView({self.nonempty()!r})"
+
+
+def to_sparse_json(record: Mapping) -> dict:
+    """``{"response_id", "profile_id", "submitted_at", "data": {non-empty fields}}``."""
+    values = record.nonempty() if isinstance(record, (SparseRecord, RecordView)) else {k: v for k, v in record.items() if v}
+    document = {key: values.pop(key, "") for key in SPARSE_KEY_FIELDS}
+    document["data"] = values
+    return document
+
+
+def from_sparse_json(document: Mapping, schema: RecordSchema) -> SparseRecord:
+    row = dict(document.get("data") or {})
+    for key in SPARSE_KEY_FIELDS:
+        if document.get(key):
+            row[key] = document[key]
+    return schema.pack(row)
+
+
+def write_sparse_jsonl(path: str, records: Iterable[Mapping]) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(to_sparse_json(record), ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def iter_sparse_jsonl(path: str, schema: RecordSchema) -> Iterator[SparseRecord]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield from_sparse_json(json.loads(line), schema)
+
+
+def iter_csv_records(path: str) -> tuple[RecordSchema, Iterator[SparseRecord]]:
+    f = open(path, "r", newline="", encoding="utf-8")
+    reader = csv.DictReader(f)
+    schema = schema_for(name.strip() for name in (reader.fieldnames or []))
+
+    def records() -> Iterator[SparseRecord]:
+        with f:
+            for row in reader:
+                yield schema.pack({(k.strip() if k is not None else None): v for k, v in row.items()})
+
+    return schema, records()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Convert a response CSV to the sparse JSON-lines layout and back.")
+    parser.add_argument("command", choices=["pack", "unpack"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.command == "pack":
+        _, records = iter_csv_records(args.source)
+        count = write_sparse_jsonl(args.target, records)
+    else:
+        from app import RESPONSE_FIELDS
+
+        schema = schema_for(RESPONSE_FIELDS)
+        count = 0
+        with open(args.target, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(schema.fields), extrasaction="ignore")
+            writer.writeheader()
+            for record in iter_sparse_jsonl(args.source, schema):
+                writer.writerow(record)
+                count += 1
+    print(f"{count} rows: {os.path.getsize(args.source)} -> {os.path.getsize(args.target)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
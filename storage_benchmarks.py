@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable
+
+import app as nin_app
+from synthetic_data import STANDARD_SIZES, SyntheticConfig, ensure_dataset, parse_size
+
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    children: int
+    repeats: int
+    best_seconds: float
+    median_seconds: float
+    peak_memory_bytes: int
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], dict]
+    run: Callable[[dict], object]
+
+
+def _latest_response(state: dict) -> dict:
+    return dict(state["responses"][-1])
+
+
+def _load_responses() -> dict:
+    return {"responses": nin_app.read_csv_as_dict_list(nin_app.RESPONSE_CSV)}
+
+
+def _upsert_existing(state: dict):
+    # Worst case for the linear scan: the matching profile is the last row.
+    rows = list(state["responses"])
+    return nin_app.upsert_response_row(rows, _latest_response(state))
+
+
+BENCHMARKS = [
+    Benchmark("normalize_response_storage", lambda: {}, lambda state: nin_app.normalize_response_storage()),
+    Benchmark("build_linked_view_data", lambda: {}, lambda state: nin_app.build_linked_view_data(write_back=False)),
+    Benchmark("upsert_response_row", _load_responses, _upsert_existing),
+    Benchmark("deduplicate_response_rows", _load_responses, lambda state: nin_app.deduplicate_response_rows(state["responses"])),
+    Benchmark(
+        "sort_response_rows_by_submitted_at",
+        _load_responses,
+        lambda state: nin_app.sort_response_rows_by_submitted_at(state["responses"], newest_first=True),
+    ),
+    Benchmark("upsert_response_save_audit", _load_responses, lambda state: nin_app.upsert_response_save_audit(_latest_response(state))),
+]
+
+
+def measure(benchmark: Benchmark, children: int, repeats: int) -> BenchmarkResult:
+    state = benchmark.setup()
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run(state)
+        timings.append(time.perf_counter() - start)
+
+    # Peak memory is taken on a separate run so tracemalloc overhead does not skew the timings.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        name=benchmark.name,
+        children=children,
+        repeats=repeats,
+        best_seconds=min(timings),
+        median_seconds=statistics.median(timings),
+        peak_memory_bytes=peak,
+    )
+
+
+def run_suite(sizes: list[int], data_root: str, repeats: int, seed: int, only: set[str] | None = None) -> list[BenchmarkResult]:
+    original_data_dir = nin_app.DATA_DIR
+    results = []
+    try:
+        for children in sizes:
+            source_dir = os.path.join(data_root, f"children_{children}")
+            ensure_dataset(source_dir, SyntheticConfig(children=children, seed=seed))
+            with tempfile.TemporaryDirectory(prefix="nin_bench_") as work_dir:
+                # Benchmarks that write (e.g. the save audit) run against a throwaway copy.
+                data_dir = os.path.join(work_dir, "data")
+                shutil.copytree(source_dir, data_dir)
+                nin_app.configure_data_paths(data_dir)
+                for benchmark in BENCHMARKS:
+                    if only and benchmark.name not in only:
+                        continue
+                    result = measure(benchmark, children, repeats)
+                    results.append(result)
+                    print(format_result(result), flush=True)
+    finally:
+        nin_app.configure_data_paths(original_data_dir)
+    return results
+
+
+def result_key(result: BenchmarkResult) -> str:
+    return f"{result.children}:{result.name}"
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path: str, results: list[BenchmarkResult]) -> None:
+    merged = load_baseline(path)
+    merged.update({result_key(result): asdict(result) for result in results})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0], "results": merged},
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def find_regressions(results: list[BenchmarkResult], baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if not previous:
+            continue
+        if result.best_seconds > previous["best_seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{result_key(result)} time {previous['best_seconds']:.4f}s -> {result.best_seconds:.4f}s"
+            )
+        if result.peak_memory_bytes > previous["peak_memory_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{result_key(result)} peak memory {previous['peak_memory_bytes'] / 1e6:.1f}MB -> {result.peak_memory_bytes / 1e6:.1f}MB"
+            )
+    return regressions
+
+
+def format_result(result: BenchmarkResult) -> str:
+    return (
+        f"{result.children:>8} {result.name:<36} best {result.best_seconds * 1000:10.2f} ms"
+        f"  median {result.median_seconds * 1000:10.2f} ms  peak {result.peak_memory_bytes / 1e6:8.1f} MB"
+    )
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark storage hot paths against synthetic datasets.")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=parse_size,
+        default=[STANDARD_SIZES["1k"], STANDARD_SIZES["10k"]],
+        help="Dataset sizes to run: 1k, 10k, 100k, 1m or integers.",
+    )
+    parser.add_argument(
+        "--data-root",
+        default=os.path.join(tempfile.gettempdir(), "nin_synthetic"),
+        help="Where generated datasets are cached between runs.",
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per benchmark; the best run is compared.")
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--only", nargs="+", help="Run only these benchmark names.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown before a regression is reported.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    results = run_suite(args.sizes, args.data_root, max(1, args.repeats), args.seed, set(args.only or []))
+
+    regressions = find_regressions(results, load_baseline(args.baseline), args.tolerance)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print("Regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 0 if args.save_baseline else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import html
+import json
+import os
+import random
+import re
+import sys
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from app import (
+    FORM_LOOP_EXPANSIONS,
+    FORM_TEMPLATE_PATH,
+    HORIBA_RESULT_FIELDS,
+    PROFILE_FIELDS,
+    RESPONSE_FIELDS,
+    RESPONSE_SAVE_AUDIT_FIELDS,
+    generate_profile_id,
+)
+from derived_fields import age_in_years, format_age_full, ifa_dose_for_weight
+
+
+STANDARD_SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+MANIFEST_NAME = "synthetic_manifest.json"
+AUDIT_LOG_FIELDS = ["timestamp", "actor_type", "actor", "event", "details"]
+LINKED_PREFIX_FIELDS = ["profile_id", "profile_found", "name", "school", "class", "section", "submitted_at", "response_id"]
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Akhil", "Ananya", "Arjun", "Bhavya", "Charan", "Deepika", "Divya", "Harsha",
+    "Ishaan", "Jahnavi", "Karthik", "Keerthi", "Lakshmi", "Madhav", "Meghana", "Nikhil", "Pranavi", "Rahul",
+    "Sahithi", "Sai", "Sanjana", "Sathwika", "Srinivas", "Tejaswini", "Varun", "Vennela", "Yashwanth", "Zoya",
+]
+SURNAMES = ["", "Reddy", "Rao", "Kumar", "Naidu", "Sharma", "Khan", "Goud", "Yadav", "Varma", "Syed", "Chary"]
+SCHOOLS = [
+    "Nethaji Public School", "Sri Sai Vidyarthi High School", "Vedic Vidyalayam High School", "GGPS",
+    "Amaravathi Concept Wing", "Sri Vidya Model High School", "Amaravathi Grammar High School",
+    "Shirdi Sai Baba High School", "St John's High School", "Govt Boys High School",
+    "Amaravathi Talent School", "Vignan Public School",
+]
+LOCATIONS = ["Urban", "Warasiguda", "Mylargadda", "Manikeshwari Nagar", "Chilkalguda", "Tukaramgate", "Amberpet", "Parsigutta"]
+CLASSES = ["Nursery", "LKG", "UKG"]
+SECTIONS = ["", "A", "B", "C"]
+INVESTIGATORS = ["K. Siva Nandini", "Bhargavi", "Deepikhaa", "Jahnavi", "Amitha", "Krithi"]
+STUDY_START = datetime(2026, 1, 5, 9, 0, 0)
+STUDY_DAYS = 90
+
+
+@dataclass
+class SyntheticConfig:
+    children: int
+    seed: int = 2026
+    response_rate: float = 0.95
+    horiba_rate: float = 0.85
+    save_audit_rate: float = 0.15
+    audit_events_per_child: float = 0.2
+
+
+def form_field_choices(template_path: str = FORM_TEMPLATE_PATH) -> dict[str, list[str]]:
+    """Radio, checkbox and select options from the questionnaire, keyed by stored field name."""
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+
+    choices: dict[str, list[str]] = {}
+
+    def add(name: str, value: str) -> None:
+        value = html.unescape(value).strip()
+        if not value or "{{" in value:
+            return
+        for field in FORM_LOOP_EXPANSIONS.get(name, [name]):
+            options = choices.setdefault(field, [])
+            if value not in options:
+                options.append(value)
+
+    for attrs in re.findall(r"<input\b([^>]*)>", template, flags=re.IGNORECASE):
+        if not re.search(r'\btype="(?:radio|checkbox)"', attrs, flags=re.IGNORECASE):
+            continue
+        name = re.search(r'\bname="([^"]+)"', attrs)
+        value = re.search(r'\bvalue="([^"]*)"', attrs)
+        if name and value:
+            add(name.group(1), value.group(1))
+
+    for name, body in re.findall(r'<select\b[^>]*\bname="([^"]+)"[^>]*>(.*?)</select>', template, flags=re.IGNORECASE | re.DOTALL):
+        for value, text in re.findall(r'<option\b(?:[^>]*\bvalue="([^"]*)")?[^>]*>(.*?)</option>', body, flags=re.IGNORECASE | re.DOTALL):
+            add(name, value if value else re.sub(r"<[^>]+>", "", text))
+    return choices
+
+
+class SyntheticDatasetWriter:
+    """Streams one synthetic child at a time into every data file, so memory stays flat at 1M rows."""
+
+    def __init__(self, config: SyntheticConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.choices = form_field_choices()
+        self.used_ids: set[str] = set()
+        response_extra = sorted(set(RESPONSE_FIELDS) - set(LINKED_PREFIX_FIELDS))
+        self.linked_fields = (
+            LINKED_PREFIX_FIELDS
+            + [field for field in response_extra if field not in HORIBA_RESULT_FIELDS]
+            + ["horiba"]
+            + HORIBA_RESULT_FIELDS
+        )
+
+    def _unique_profile_id(self, base_id: str) -> str:
+        candidate = base_id
+        suffix = 0
+        while candidate in self.used_ids:
+            suffix += 1
+            candidate = f"{base_id}{suffix:02d}"
+        self.used_ids.add(candidate)
+        return candidate
+
+    def _clock(self, start: datetime, minutes: float) -> datetime:
+        return start + timedelta(minutes=minutes)
+
+    def profile(self) -> dict[str, str]:
+        rng = self.rng
+        created = STUDY_START + timedelta(days=rng.randrange(STUDY_DAYS), seconds=rng.randrange(7 * 3600))
+        dob = created.date() - timedelta(days=rng.randrange(3 * 365, 6 * 365))
+        gender = rng.choice(["Male", "Female"])
+        name = rng.choice(FIRST_NAMES)
+        surname = rng.choice(SURNAMES)
+        school = rng.choice(SCHOOLS)
+        location = rng.choice(LOCATIONS)
+        created_at = created.strftime("%Y-%m-%d %H:%M:%S")
+        years = age_in_years(dob.isoformat(), created_at)
+        return {
+            "profile_id": self._unique_profile_id(generate_profile_id(name, surname, dob.isoformat(), gender, school, location)),
+            "created_at": created_at,
+            "name": name,
+            "surname": surname,
+            "dob": dob.isoformat(),
+            "age": "" if years is None else str(years),
+            "age_full": format_age_full(dob.isoformat(), created_at),
+            "gender": gender,
+            "school": school,
+            "location": location,
+            "class": rng.choice(CLASSES),
+            "section": rng.choice(SECTIONS),
+        }
+
+    def response(self, profile: dict[str, str]) -> dict[str, str]:
+        rng = self.rng
+        row = {field: "" for field in RESPONSE_FIELDS}
+        for field, options in self.choices.items():
+            if field in row:
+                row[field] = rng.choice(options)
+
+        try:
+            created = datetime.strptime(profile["created_at"], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            # Real datasets (load_test.py --source) have profiles with no or odd timestamps.
+            created = STUDY_START
+        started = created + timedelta(minutes=rng.randrange(5, 90))
+        submitted = self._clock(started, rng.uniform(25, 60))
+        true_hb = rng.gauss(11.4, 1.2)
+        weight = round(rng.uniform(12, 22), 1)
+
+        row.update({
+            "response_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "profile_id": profile["profile_id"],
+            "submitted_at": submitted.strftime("%Y-%m-%d %H:%M:%S"),
+            "study_id": profile["profile_id"],
+            "child_id_code": profile["profile_id"],
+            "participant_name": f"{profile['name']} {profile['surname']}".strip(),
+            "study_date": started.date().isoformat(),
+            "study_datetime": started.strftime("%Y-%m-%dT%H:%M:%S+05:30"),
+            "age_calculated_at": started.strftime("%Y-%m-%dT%H:%M:%S+05:30"),
+            "dob": profile["dob"],
+            "age_full": format_age_full(profile["dob"], started.date().isoformat()),
+            "age_completed": str(age_in_years(profile["dob"], started.date().isoformat()) or ""),
+            "sex": profile["gender"],
+            "school_anganwadi_name": profile["school"],
+            "location_type": rng.choice(self.choices.get("location_type", ["Urban"])),
+            "height_cms": f"{rng.uniform(92, 118):.1f}",
+            "weight_kgs": f"{weight}",
+            "ifa_dose": ifa_dose_for_weight(str(weight)),
+            "mobile_no": f"{rng.randint(6, 9)}{rng.randrange(10 ** 9):09d}",
+            "investigator_name": rng.choice(INVESTIGATORS),
+            "investigator_signature": rng.choice(INVESTIGATORS),
+            "siblings_count": str(rng.randint(0, 3)),
+            "family_members_total": str(rng.randint(3, 9)),
+            "kuppuswamy_total_score": str(rng.randint(3, 26)),
+            "masimo_reading": f"{true_hb + rng.gauss(0.4, 1.0):.1f}",
+            "poc_hb_value": f"{true_hb + rng.gauss(0.2, 0.6):.1f}",
+            "lab_hb_value": f"{true_hb + rng.gauss(0, 0.3):.1f}",
+            "child_classification": "Anaemic" if true_hb < 11 else "Non-anaemic",
+            "referral_date": submitted.date().isoformat() if true_hb < 11 else "",
+        })
+        for offset, device in enumerate(["masimo", "poc", "lab"]):
+            device_start = self._clock(started, offset * 8 + rng.uniform(0, 3))
+            row[f"{device}_start_time"] = device_start.strftime("%H:%M:%S")
+            row[f"{device}_end_time"] = self._clock(device_start, rng.uniform(1, 6)).strftime("%H:%M:%S")
+            total = sum(int(row.get(f"{device}_flacc_{part}", "0") or 0) for part in ["face", "legs", "activity", "cry", "consolability"])
+            row[f"{device}_flacc_total"] = str(total)
+        return row
+
+    def linked(self, profile: dict[str, str], response: dict[str, str] | None) -> dict[str, str]:
+        rng = self.rng
+        row = {field: "" for field in self.linked_fields}
+        if response:
+            row.update({key: value for key, value in response.items() if key in row})
+        row.update({
+            "profile_id": profile["profile_id"],
+            "profile_found": "yes",
+            "name": profile["name"],
+            "school": profile["school"],
+            "class": profile["class"],
+            "section": profile["section"],
+        })
+        if response and rng.random() < self.config.horiba_rate:
+            hgb = float(response["lab_hb_value"])
+            rbc = rng.uniform(3.8, 5.2)
+            mcv = rng.uniform(65, 85)
+            row.update({
+                "horiba": f"{hgb:.1f}",
+                "HGB": f"{hgb:.1f}",
+                "RBC": f"{rbc:.2f}",
+                "MCV": f"{mcv:.0f}",
+                "HCT": f"{rbc * mcv / 10:.1f}",
+                "MCH": f"{hgb / rbc * 10:.1f}",
+                "MCHC": f"{hgb / (rbc * mcv / 10) * 100:.1f}",
+                "RDW": f"{rng.uniform(12, 18):.1f}",
+                "RDW_SD": f"{rng.uniform(35, 48):.4f}",
+                "PLT": str(rng.randint(150, 450)),
+                "MPV": f"{rng.uniform(6, 11):.1f}",
+                "PDW": f"{rng.uniform(10, 17):.1f}",
+                "THT": f"{rng.uniform(0.12, 0.35):.3f}",
+                "WBC": f"{rng.uniform(4, 14):.1f}",
+                "LYM#": f"{rng.uniform(1.5, 7):.1f}",
+                "LYM%": f"{rng.uniform(25, 60):.1f}",
+                "MON#": f"{rng.uniform(0.1, 1):.1f}",
+                "MON%": f"{rng.uniform(2, 9):.1f}",
+                "GRA#": f"{rng.uniform(1.5, 8):.1f}",
+                "GRA%": f"{rng.uniform(30, 65):.1f}",
+            })
+        return row
+
+    def save_audit(self, response: dict[str, str]) -> dict[str, str]:
+        submitted = datetime.strptime(response["submitted_at"], "%Y-%m-%d %H:%M:%S")
+        row = {field: response.get(field, "") for field in RESPONSE_SAVE_AUDIT_FIELDS}
+        row["saved_at"] = (submitted - timedelta(minutes=self.rng.uniform(2, 20))).strftime("%Y-%m-%d %H:%M:%S")
+        # Save-progress snapshots are partial: drop the later sections of the form.
+        cut = self.rng.randrange(len(RESPONSE_FIELDS) // 3, len(RESPONSE_FIELDS))
+        for field in RESPONSE_FIELDS[cut:]:
+            row[field] = ""
+        return row
+
+    def audit_event(self, profile: dict[str, str]) -> dict[str, str]:
+        actor = self.rng.choice(INVESTIGATORS)
+        event = self.rng.choice(["login", "logout", "machine_update"])
+        details = {
+            "login": "Investigator logged in",
+            "logout": "Investigator logged out",
+            "machine_update": f"Horiba updated for {profile['profile_id']}: '' -> '{self.rng.uniform(8, 14):.1f}'",
+        }[event]
+        return {
+            "timestamp": profile["created_at"],
+            "actor_type": "investigator",
+            "actor": actor,
+            "event": event,
+            "details": details,
+        }
+
+    def write(self, out_dir: str) -> dict[str, int]:
+        os.makedirs(out_dir, exist_ok=True)
+        targets = {
+            "profiles.csv": PROFILE_FIELDS,
+            "responses.csv": RESPONSE_FIELDS,
+            "linked_data.csv": self.linked_fields,
+            "response_save_audit.csv": RESPONSE_SAVE_AUDIT_FIELDS,
+            "investigator_audit_log.csv": AUDIT_LOG_FIELDS,
+        }
+        counts = {name: 0 for name in targets}
+        handles = {name: open(os.path.join(out_dir, name), "w", newline="", encoding="utf-8") for name in targets}
+        try:
+            writers = {name: csv.DictWriter(handles[name], fieldnames=fields) for name, fields in targets.items()}
+            for writer in writers.values():
+                writer.writeheader()
+
+            def emit(name: str, row: dict[str, str]) -> None:
+                writers[name].writerow(row)
+                counts[name] += 1
+
+            for _ in range(self.config.children):
+                profile = self.profile()
+                emit("profiles.csv", profile)
+                response = self.response(profile) if self.rng.random() < self.config.response_rate else None
+                if response:
+                    emit("responses.csv", response)
+                    if self.rng.random() < self.config.save_audit_rate:
+                        emit("response_save_audit.csv", self.save_audit(response))
+                emit("linked_data.csv", self.linked(profile, response))
+                if self.rng.random() < self.config.audit_events_per_child:
+                    emit("investigator_audit_log.csv", self.audit_event(profile))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return counts
+
+
+def generate_dataset(out_dir: str, config: SyntheticConfig) -> dict:
+    """Write a synthetic data directory and a manifest describing it."""
+    counts = SyntheticDatasetWriter(config).write(out_dir)
+    manifest = {
+        "children": config.children,
+        "seed": config.seed,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "rows": counts,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(out_dir: str) -> dict | None:
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_dataset(out_dir: str, config: SyntheticConfig) -> dict:
+    """Reuse an existing dataset when it was generated with the same size and seed."""
+    manifest = read_manifest(out_dir)
+    if manifest and manifest.get("children") == config.children and manifest.get("seed") == config.seed:
+        return manifest
+    return generate_dataset(out_dir, config)
+
+
+def parse_size(value: str) -> int:
+    text = value.strip().lower()
+    if text in STANDARD_SIZES:
+        return STANDARD_SIZES[text]
+    try:
+        size = int(text.replace("_", ""))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Unknown dataset size: {value}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError("Dataset size must be positive")
+    return size
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic profiles, responses, linked data and audit files for benchmarking."
+    )
+    parser.add_argument("out_dir", help="Directory to write the CSV files into.")
+    parser.add_argument("--children", type=parse_size, default=1_000, help="Number of children: 1k, 10k, 100k, 1m or an integer.")
+    parser.add_argument("--seed", type=int, default=2026, help="Random seed; the same seed reproduces the same data.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    manifest = generate_dataset(args.out_dir, SyntheticConfig(children=args.children, seed=args.seed))
+    for name, count in manifest["rows"].items():
+        print(f"{name}: {count} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import csv
+from collections.abc import Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+
+MAX_SHEET_TITLE = 31
+
+
+@dataclass
+class SheetSpec:
+    title: str
+    columns: list[str]
+    # Mappings (dicts, record views) are looked up by column; lists/tuples are written as they are.
+    rows: Iterable
+
+    @contextmanager
+    def open(self) -> Iterator[tuple[list[str], Iterable]]:
+        yield list(self.columns), self.rows
+
+
+@dataclass
+class CsvSheet:
+    """A sheet read from a CSV file (header row first) only while the workbook writes it."""
+
+    title: str
+    path: str
+
+    @contextmanager
+    def open(self) -> Iterator[tuple[list[str], Iterable]]:
+        with open(self.path, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            yield next(reader, []), reader
+
+
+def _cell_value(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # Blank cells rather than empty strings, and no control characters Excel would reject.
+        return ILLEGAL_CHARACTERS_RE.sub("", value) or None
+    return value
+
+
+def write_xlsx(path: str, sheets: Iterable[SheetSpec | CsvSheet]) -> int:
+    """Write every sheet with openpyxl's write-only mode; returns the number of data rows.
+
+    Rows are serialized as they are appended, so memory does not grow with the row count.
+    """
+    workbook = Workbook(write_only=True)
+    total = 0
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(title=sheet.title[:MAX_SHEET_TITLE])
+        with sheet.open() as (columns, rows):
+            worksheet.append(columns)
+            for row in rows:
+                values = [row.get(column) for column in columns] if isinstance(row, Mapping) else row
+                worksheet.append([_cell_value(value) for value in values])
+                total += 1
+    workbook.save(path)
+    return total
+
+
+def csv_sheet(title: str, path: str) -> CsvSheet:
+    """A sheet whose rows are read from ``path`` while the workbook is written.
+
+    The file is opened only when the sheet is reached and closed once it is written,
+    so a build that fails earlier leaves no handle open (which would block os.replace
+    of the file on Windows).
+    """
+    return CsvSheet(title=title, path=path)